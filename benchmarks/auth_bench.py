@@ -0,0 +1,154 @@
+"""
+Benchmark de la dependencia de autenticación (validate_access_token).
+
+Levanta una app FastAPI mínima protegida por la dependencia y la ejercita
+en proceso (httpx + ASGITransport) con N peticiones y C concurrentes. Los
+tokens y certificados vienen de middlewares/firebaseStandIn.py, así que se
+ejercita la verificación completa sin red.
+
+Escenarios:
+    async-cached    dependencia async, mismo token (caché de tokens verificados)
+    async-uncached  dependencia async sin caché (RS256 en el threadpool en cada petición)
+    baseline-sync   la versión anterior: dependencia sync en el threadpool, sin caché,
+                    que parsea el certificado X.509 a clave PEM en cada petición
+                    (sin los print de _get_firebase_certs, para no medir la consola)
+
+Uso:
+    python -m benchmarks.auth_bench --requests 5000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault("FIREBASE_PROJECT_ID", "bench-project")
+os.environ["FIREBASE_AUTH_STANDIN"] = "true"
+os.environ["DEVELOP"] = "true"
+
+
+def _baseline_dependency():
+    """validate_access_token y _verify_firebase_jwt tal como estaban antes del FirebaseKeyManager"""
+    import jwt
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+    from fastapi import Header, HTTPException
+
+    from middlewares import authMiddleware, firebaseStandIn
+
+    certs = firebaseStandIn.certs_document()
+    certs_lock = threading.Lock()
+
+    def get_certs():
+        with certs_lock:
+            return certs
+
+    def verify(id_token: str) -> dict:
+        header = jwt.get_unverified_header(id_token)
+        kid = header.get('kid')
+        if header.get('alg') != 'RS256' or not kid:
+            raise ValueError('Encabezado JWT inválido')
+        cert_pem = get_certs().get(kid)
+        if not cert_pem:
+            raise ValueError(f'Clave pública desconocida: {kid}')
+        cert_obj = x509.load_pem_x509_certificate(cert_pem.encode('utf-8'))
+        public_key = cert_obj.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        payload = jwt.decode(
+            id_token,
+            public_key,
+            algorithms=['RS256'],
+            audience=authMiddleware.PROJECT_ID,
+            issuer=f'https://securetoken.google.com/{authMiddleware.PROJECT_ID}',
+        )
+        if not payload.get('sub'):
+            raise ValueError("Claim 'sub' inválido en JWT")
+        return payload
+
+    def dependency(authorization: str = Header(None)):
+        try:
+            verify(authorization.split()[1])
+        except (ValueError, jwt.PyJWTError):
+            raise HTTPException(status_code=403)
+
+    return dependency
+
+
+def _build_app(dependency):
+    from fastapi import Depends, FastAPI
+
+    app = FastAPI(dependencies=[Depends(dependency)])
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def _run(app, token: str, total: int, concurrency: int):
+    import httpx
+
+    latencies = []
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Calentar: primera descarga de certificados y primera verificación
+        (await client.get("/ping", headers=headers)).raise_for_status()
+
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.get("/ping", headers=headers)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    from middlewares import authMiddleware, firebaseStandIn
+    from middlewares.rateLimiter import RateLimiter
+
+    # Un solo usuario a miles de req/s: sin límites por usuario para medir solo la autenticación
+    authMiddleware.rate_limiter = RateLimiter(rate=0, burst=0, max_concurrent=0)
+
+    token = firebaseStandIn.mint_token("bench-user")
+    cache_size = authMiddleware._TOKEN_CACHE_SIZE
+    scenarios = [
+        ("async-cached", authMiddleware.validate_access_token, cache_size),
+        ("async-uncached", authMiddleware.validate_access_token, 0),
+        ("baseline-sync", _baseline_dependency(), 0),
+    ]
+
+    print(f"{'escenario':<18}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, dependency, size in scenarios:
+        authMiddleware._TOKEN_CACHE_SIZE = size
+        authMiddleware._verified_tokens.clear()
+        result = asyncio.run(_run(_build_app(dependency), token, args.requests, args.concurrency))
+        print(f"{name:<18}{result['rps']:>10.0f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+    authMiddleware._TOKEN_CACHE_SIZE = cache_size
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de la decodificación tipada de solicitudes (utils/buroSchema.py).
+
+Compara, por línea NDJSON, la versión con dicts (json.loads +
+map_to_evaluate_request) contra la tipada (decode_request + map_typed_request),
+que es la que usa map_json_to_evaluate_request en /map-to-evaluate-request/batch.
+Los créditos sintéticos llevan también los campos de Buró que el mapping no usa
+(como los reportes reales), y se verifica que ambos resultados sean iguales.
+
+Uso:
+    python -m benchmarks.buro_decode_bench --lines 20000 --credits 12
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import generate_applicants
+from utils.buroSchema import decode_request, map_typed_request
+from utils.financialCalcs import map_to_evaluate_request
+
+_NOW = datetime(2025, 6, 1)
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a):
+        return math.isnan(b)
+    if isinstance(a, dict):
+        return type(b) is dict and a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return type(b) is list and len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def _with_unused_fields(applicant: dict, rnd: random.Random) -> dict:
+    """Agrega los campos de Buró que el mapping ignora (score, historia, cuentas, ...)"""
+    member = applicant["buroReportData"]["Buro"][0]
+    member.update({"id": "report-id", "provider": "Buro", "productType": "PM", "createdAt": "2025-05-30"})
+    data = member["data"]
+    data["score"] = [{"valorScore": str(rnd.randint(400, 850)), "codigoScore": "007"}]
+    data["historia"] = [
+        {"periodo": f"2024{month:02d}", "saldoVigente": str(rnd.randint(0, 10**6)), "saldoVencidoA90Dias": "0"}
+        for month in range(1, 13)
+    ]
+    data["datosGenerales"] = {"nombre": "EMPRESA SINTETICA SA DE CV", "rfcCliente": "ESI010101AAA", "pais": "MX"}
+    for credit in data["creditoFinanciero"]:
+        credit.update({
+            "plazo": "36", "moneda": "MX", "montoPago": str(rnd.randint(1000, 90000)),
+            "numeroCuenta": str(rnd.randint(10**9, 10**10)), "tipoCredito": "1380",
+            "saldoVigente": str(rnd.randint(0, 10**6)), "saldoInsoluto": str(rnd.randint(0, 10**6)),
+            "fechaUltimoPago": "2025-04-30", "frecuenciaPagos": "M", "tipoUsuario": "BANCO",
+        })
+    return applicant
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=20_000)
+    parser.add_argument("--credits", type=int, default=12, help="máximo de créditos financieros por solicitud")
+    args = parser.parse_args()
+
+    rnd = random.Random(11)
+    lines = [
+        json.dumps(_with_unused_fields(applicant, rnd)).encode()
+        for applicant in generate_applicants(args.lines, args.credits)
+    ]
+    size_mb = sum(map(len, lines)) / 1e6
+
+    expected, dict_seconds = _timed(lambda: [map_to_evaluate_request(json.loads(line), _NOW) for line in lines])
+    result, typed_seconds = _timed(lambda: [map_typed_request(decode_request(line), _NOW) for line in lines])
+    if not all(_same(e, r) for e, r in zip(expected, result)):
+        raise SystemExit("❌ Resultados distintos entre la versión con dicts y la tipada")
+
+    print(f"{args.lines} líneas, {size_mb:.1f} MB")
+    print(f"{'versión':<10}{'s':>8}{'líneas/s':>12}{'MB/s':>8}")
+    for name, seconds in (("dicts", dict_seconds), ("tipada", typed_seconds)):
+        print(f"{name:<10}{seconds:>8.2f}{args.lines / seconds:>12.0f}{size_mb / seconds:>8.1f}")
+    print(f"speedup: {dict_seconds / typed_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
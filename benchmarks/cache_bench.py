@@ -0,0 +1,280 @@
+"""
+Benchmark de concurrencia del cache de respuestas (controllers/cacheController.py).
+
+SimpleCache serializa cada get y set en un solo Lock y en cada set reescribe el
+archivo completo. Este benchmark mide cómo se comporta al crecer el número de
+entradas y la concurrencia, en dos modos:
+
+    threads  N hilos llamando get/set en paralelo (como en el threadpool)
+    asyncio  N tareas en un event loop, que llaman al cache directamente y
+             ceden el loop entre operaciones (como _fetch_cached)
+
+Cargas:
+    get     solo lecturas de entradas vigentes
+    mixed   95% lecturas, 5% escrituras
+    set     solo escrituras (reemplazo de entradas existentes)
+    expiry  lecturas de entradas vencidas: cada lectura borra la entrada y,
+            fuera de la latencia medida (no de ops/s), se vuelve a insertar
+            ya vencida
+
+Los valores son las respuestas reales de cache.json, asignadas en ciclo a
+llaves sintéticas, así que los tamaños siguen la distribución real. El cache
+se precarga con --entries entradas (de 10 a 100,000) en un archivo temporal.
+
+Reporta ops/s, percentiles de latencia por operación y la amplificación de
+escritura: bytes escritos a disco (wchar de /proc/self/io, o el tamaño del
+archivo tras cada set si no está disponible) entre bytes de los valores
+escritos. Las cargas con escrituras se omiten si el archivo estimado supera
+--max-file-mb (con SimpleCache, cada set escribiría ese archivo completo).
+
+Para comparar otro backend con la misma interfaz (constructor con
+cache_file, get(key) y set(key, value, ttl)) se pasa con --backend; --output
+guarda los resultados en JSON.
+
+Uso:
+    python -m benchmarks.cache_bench
+    python -m benchmarks.cache_bench --entries 10 1000 --threads 1 8 64 --duration 2
+    python -m benchmarks.cache_bench --backend controllers.cacheController:SimpleCache --output simple.json
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+_CACHE_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache.json")
+_WORKLOADS = ("get", "mixed", "set", "expiry")
+_SET_RATIO = {"get": 0.0, "mixed": 0.05, "set": 1.0, "expiry": 0.0}
+
+
+def _load_payloads(path: str) -> list:
+    """Valores de cache.json (sin importar si ya vencieron)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [entry["value"] for entry in json.load(f).values()]
+
+
+def _load_backend(spec: str):
+    module_name, class_name = spec.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _written_bytes() -> int:
+    """Bytes escritos por el proceso (Linux); -1 si no se puede medir"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+class _Scenario:
+    """Cache precargado, secuencia de operaciones y contadores de un escenario"""
+
+    def __init__(self, backend_class, directory: str, entries: int, workload: str,
+                 payloads: list, payload_sizes: list, seed: int):
+        self.cache_file = os.path.join(directory, f"cache-{entries}-{workload}.json")
+        self.cache = backend_class(cache_file=self.cache_file)
+        self.keys = [f"https://bench.local/entities/{index}" for index in range(entries)]
+        self.payloads = payloads
+        self.payload_sizes = payload_sizes
+        self.workload = workload
+        self.seed = seed
+        self.file_writes = 0
+        self.file_bytes = 0
+        self.payload_bytes = 0
+        self.count_lock = threading.Lock()
+        self._preload(entries)
+
+    def _preload(self, entries: int):
+        ttl = -1 if self.workload == "expiry" else 3600
+        for index, key in enumerate(self.keys):
+            self._insert(key, self.payloads[index % len(self.payloads)], ttl)
+
+    def _insert(self, key: str, value, ttl: float):
+        store = getattr(self.cache, "cache", None)
+        if isinstance(store, dict):
+            # Formato interno de SimpleCache: llave -> (valor, expiración); sin escribir el archivo
+            store[key] = (value, time.time() + ttl)
+        else:
+            self.cache.set(key, value, ttl=ttl)
+
+    def operations(self, worker: int, size: int = 4096) -> list:
+        """(es_set, llave, índice del valor) pseudoaleatorios para un worker"""
+        rnd = random.Random(self.seed * 1009 + worker)
+        ratio = _SET_RATIO[self.workload]
+        return [
+            (rnd.random() < ratio, self.keys[rnd.randrange(len(self.keys))], rnd.randrange(len(self.payloads)))
+            for _ in range(size)
+        ]
+
+    def run_op(self, operation, latencies: dict):
+        is_set, key, payload = operation
+        if is_set:
+            start = time.perf_counter()
+            self.cache.set(key, self.payloads[payload], ttl=3600)
+            latencies["set"].append(time.perf_counter() - start)
+            with self.count_lock:
+                self.file_writes += 1
+                self.file_bytes += os.path.getsize(self.cache_file) if os.path.exists(self.cache_file) else 0
+                self.payload_bytes += self.payload_sizes[payload]
+        else:
+            start = time.perf_counter()
+            self.cache.get(key)
+            latencies["get"].append(time.perf_counter() - start)
+            if self.workload == "expiry":
+                # La lectura borró la entrada vencida; se repone vencida para
+                # que la siguiente lectura de esta llave también expire
+                self._insert(key, self.payloads[payload], -1)
+
+
+def _run_threads(scenario: _Scenario, workers: int, duration: float, max_ops: int) -> list:
+    results = [{"get": [], "set": []} for _ in range(workers)]
+    barrier = threading.Barrier(workers + 1)
+    budget = max(1, max_ops // workers)
+
+    def worker(index: int):
+        operations = scenario.operations(index)
+        latencies = results[index]
+        barrier.wait()
+        deadline = time.perf_counter() + duration
+        for count in range(budget):
+            scenario.run_op(operations[count % len(operations)], latencies)
+            if time.perf_counter() >= deadline:
+                break
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+async def _run_tasks(scenario: _Scenario, workers: int, duration: float, max_ops: int) -> list:
+    results = [{"get": [], "set": []} for _ in range(workers)]
+    budget = max(1, max_ops // workers)
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int):
+        operations = scenario.operations(index)
+        latencies = results[index]
+        for count in range(budget):
+            scenario.run_op(operations[count % len(operations)], latencies)
+            if time.perf_counter() >= deadline:
+                break
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(worker(index) for index in range(workers)))
+    return results
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(len(values) * q))] * 1e6
+    return {"p50_us": statistics.median(values) * 1e6, "p95_us": pick(0.95),
+            "p99_us": pick(0.99), "max_us": values[-1] * 1e6}
+
+
+def run_scenario(backend_class, directory: str, mode: str, workers: int, entries: int,
+                 workload: str, payloads: list, payload_sizes: list,
+                 duration: float, max_ops: int, seed: int) -> dict:
+    scenario = _Scenario(backend_class, directory, entries, workload, payloads, payload_sizes, seed)
+    written_before = _written_bytes()
+    start = time.perf_counter()
+    if mode == "threads":
+        results = _run_threads(scenario, workers, duration, max_ops)
+    else:
+        results = asyncio.run(_run_tasks(scenario, workers, duration, max_ops))
+    elapsed = time.perf_counter() - start
+    written = _written_bytes() - written_before if written_before >= 0 else scenario.file_bytes
+
+    gets = [latency for result in results for latency in result["get"]]
+    sets = [latency for result in results for latency in result["set"]]
+    if os.path.exists(scenario.cache_file):
+        os.remove(scenario.cache_file)
+    return {
+        "mode": mode, "workers": workers, "entries": entries, "workload": workload,
+        "ops": len(gets) + len(sets),
+        "ops_per_s": (len(gets) + len(sets)) / elapsed,
+        "get": _percentiles(gets),
+        "set": _percentiles(sets),
+        "file_writes": scenario.file_writes,
+        "written_mb": written / 1e6,
+        "write_amplification": written / scenario.payload_bytes if scenario.payload_bytes else None,
+    }
+
+
+def _format(result: dict) -> str:
+    def latency(operation, name):
+        value = result[operation].get(name)
+        return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+
+    amplification = result["write_amplification"]
+    return (f"{result['mode']:<8}{result['workers']:>5}{result['entries']:>9}  {result['workload']:<7}"
+            f"{result['ops_per_s']:>11.0f}{latency('get', 'p50_us')}{latency('get', 'p99_us')}"
+            f"{latency('set', 'p50_us')}{latency('set', 'p99_us')}{result['file_writes']:>8}"
+            f"{(f'{amplification:.0f}x' if amplification is not None else '-'):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="hilos (modo threads) y tareas (modo asyncio)")
+    parser.add_argument("--modes", nargs="+", choices=["threads", "asyncio"], default=["threads", "asyncio"])
+    parser.add_argument("--workloads", nargs="+", choices=_WORKLOADS, default=list(_WORKLOADS))
+    parser.add_argument("--duration", type=float, default=1.0, help="segundos por escenario")
+    parser.add_argument("--max-ops", type=int, default=200_000, help="operaciones máximas por escenario")
+    parser.add_argument("--max-file-mb", type=float, default=64.0,
+                        help="omitir cargas con escrituras si el archivo estimado es mayor")
+    parser.add_argument("--payloads", default=_CACHE_JSON, help="cache.json del que se toman los valores")
+    parser.add_argument("--backend", default="controllers.cacheController:SimpleCache")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    backend_class = _load_backend(args.backend)
+    payloads = _load_payloads(args.payloads)
+    payload_sizes = [len(json.dumps(payload)) for payload in payloads]
+    # Tamaño de una entrada en el archivo de SimpleCache (json.dump con indent=4)
+    entry_size = statistics.mean(len(json.dumps({"value": p, "expiry": 0.0}, indent=4)) for p in payloads)
+    print(f"{len(payloads)} valores de {args.payloads}: {min(payload_sizes)}-{max(payload_sizes)} bytes, "
+          f"mediana {statistics.median(payload_sizes):.0f}")
+    print(f"{'modo':<8}{'N':>5}{'entradas':>9}  {'carga':<7}{'ops/s':>11}{'get p50':>10}{'get p99':>10}"
+          f"{'set p50':>10}{'set p99':>10}{'escrit.':>8}{'amplif.':>10}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for entries in args.entries:
+            for workload in args.workloads:
+                estimated_mb = entries * entry_size / 1e6
+                if _SET_RATIO[workload] and estimated_mb > args.max_file_mb:
+                    print(f"{'':<22}{entries:>9}  {workload:<7}omitida: archivo estimado de {estimated_mb:.0f} MB")
+                    continue
+                for mode in args.modes:
+                    for workers in args.threads:
+                        result = run_scenario(backend_class, directory, mode, workers, entries, workload,
+                                              payloads, payload_sizes, args.duration, args.max_ops, args.seed)
+                        results.append(result)
+                        print(_format(result), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"backend": args.backend, "results": results}, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
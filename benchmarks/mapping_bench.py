@@ -0,0 +1,203 @@
+"""
+Benchmark de map_to_evaluate_request (utils/financialCalcs.py) por sección.
+
+Cada escenario es un número de solicitudes sintéticas (benchmarks/synthetic.py,
+semilla fija) con el mismo número de líneas de crédito, de 1 a 50,000. Por
+escenario se mide:
+- tiempo por solicitud de cada sección (map_sections con una sola sección) y
+  del mapping completo: el mejor de --repeat corridas. Antes de cada corrida
+  se vacían los caches por valor (fechas, historiales de pagos, actividades)
+  para medir el trabajo real; los catálogos ya cargados se conservan. Con
+  --warm los caches quedan llenos de la corrida anterior, como en un
+  servidor que recibe las mismas solicitudes;
+- throughput: solicitudes/s y líneas de crédito/s del mapping completo;
+- memoria con tracemalloc (en una corrida aparte, porque lo hace más lento):
+  pico promedio de KiB que usa el mapping de una solicitud.
+
+Con --save-baseline los resultados se guardan en
+benchmarks/baselines/mapping_bench.json; con --check se comparan contra ese
+archivo y el proceso termina con código 1 si algún tiempo o pico de memoria
+supera al de la línea base en más de --tolerance. Los tiempos dependen de la
+máquina: la línea base se regenera en la máquina donde se va a comparar.
+
+Uso:
+    python -m benchmarks.mapping_bench
+    python -m benchmarks.mapping_bench --scenarios 12 1000 --save-baseline
+    python -m benchmarks.mapping_bench --check --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.synthetic import generate_request
+from utils.financialCalcs import (
+    MAPPING_VERSION,
+    SECTIONS,
+    _parse_date_str,
+    _payment_history_summary,
+    map_sections,
+    map_to_evaluate_request,
+)
+from utils.scianIndex import match_activity
+
+_NOW = datetime(2025, 6, 1)
+_BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines", "mapping_bench.json")
+
+# Líneas de crédito por solicitud -> solicitudes del escenario (~20k líneas cada uno)
+_SCENARIOS = {1: 5000, 12: 2000, 100: 200, 1000: 20, 50_000: 1}
+
+# Diferencias menores a esto (µs o KiB por solicitud) son ruido, no regresiones
+_MIN_DELTA = 0.5
+
+_VALUE_CACHES = (_parse_date_str, _payment_history_summary, match_activity)
+
+
+def _clear_caches():
+    for cached in _VALUE_CACHES:
+        cached.cache_clear()
+
+
+def _requests_for(credit_lines: int, seed: int) -> list:
+    rnd = random.Random(seed * 100_003 + credit_lines)
+    count = _SCENARIOS.get(credit_lines, max(1, 20_000 // credit_lines))
+    return [generate_request(rnd, credit_lines) for _ in range(count)]
+
+
+def _run(requests: list, sections) -> None:
+    if sections is None:
+        for data in requests:
+            map_to_evaluate_request(data, _NOW)
+    else:
+        for data in requests:
+            map_sections(data, sections, _NOW)
+
+
+def _best_time(requests: list, sections, repeat: int, warm: bool) -> float:
+    _run(requests, sections)
+    best = float("inf")
+    for _ in range(repeat):
+        if not warm:
+            _clear_caches()
+        start = time.perf_counter()
+        _run(requests, sections)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_kib(requests: list, sections, warm: bool) -> float:
+    if not warm:
+        _clear_caches()
+    total = 0
+    tracemalloc.start()
+    try:
+        for data in requests:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            _run([data], sections)
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+    return total / 1024 / len(requests)
+
+
+def run_scenario(credit_lines: int, repeat: int, seed: int, warm: bool = False) -> dict:
+    requests = _requests_for(credit_lines, seed)
+    count = len(requests)
+    result = {"requests": count, "credit_lines": credit_lines, "sections": {}}
+    for section in SECTIONS + ("total",):
+        sections = None if section == "total" else (section,)
+        seconds = _best_time(requests, sections, repeat, warm)
+        result["sections"][section] = {
+            "us_per_request": seconds / count * 1e6,
+            "peak_kib_per_request": _peak_kib(requests, sections, warm),
+        }
+    total = result["sections"]["total"]["us_per_request"] / 1e6
+    result["requests_per_s"] = 1 / total
+    result["credit_lines_per_s"] = credit_lines / total
+    return result
+
+
+def _print_scenario(result: dict):
+    print(f"\n{result['credit_lines']} líneas de crédito x {result['requests']} solicitudes: "
+          f"{result['requests_per_s']:.0f} sol/s, {result['credit_lines_per_s']:.0f} líneas/s")
+    print(f"  {'sección':<8}{'µs/sol':>14}{'pico KiB/sol':>14}")
+    for section, metrics in result["sections"].items():
+        print(f"  {section:<8}{metrics['us_per_request']:>14.1f}{metrics['peak_kib_per_request']:>14.1f}")
+
+
+def _regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """(escenario, sección, métrica, actual, línea base) que empeoraron más de la tolerancia"""
+    found = []
+    for scenario, result in results.items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if base is None:
+            continue
+        for section, metrics in result["sections"].items():
+            for metric, value in metrics.items():
+                reference = base["sections"].get(section, {}).get(metric)
+                if reference is not None and value > reference * (1 + tolerance) + _MIN_DELTA:
+                    found.append((scenario, section, metric, value, reference))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, nargs="+", default=list(_SCENARIOS),
+                        help="líneas de crédito por solicitud (1 a 50000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--warm", action="store_true", help="no vaciar los caches entre corridas")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="comparar contra la línea base guardada")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="empeoramiento permitido (0.25 = 25%%)")
+    parser.add_argument("--baseline-file", default=_BASELINE_FILE)
+    args = parser.parse_args()
+
+    if any(not 1 <= lines <= 50_000 for lines in args.scenarios):
+        parser.error("--scenarios debe estar entre 1 y 50000 líneas de crédito")
+
+    results = {}
+    for credit_lines in args.scenarios:
+        results[str(credit_lines)] = run_scenario(credit_lines, args.repeat, args.seed, args.warm)
+        _print_scenario(results[str(credit_lines)])
+
+    if args.check:
+        with open(args.baseline_file, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("mapping_version") != MAPPING_VERSION:
+            print(f"\n⚠️ La línea base es de MAPPING_VERSION {baseline.get('mapping_version')}")
+        if baseline.get("warm", False) != args.warm:
+            print("\n⚠️ La línea base se midió con otro modo de caches (--warm)")
+        regressions = _regressions(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} métricas empeoraron más de {args.tolerance:.0%}:")
+            for scenario, section, metric, value, reference in regressions:
+                print(f"  {scenario} líneas, {section}, {metric}: {value:.1f} (base {reference:.1f})")
+            sys.exit(1)
+        print("\n✅ Sin regresiones contra la línea base")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline_file), exist_ok=True)
+        with open(args.baseline_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "mapping_version": MAPPING_VERSION,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "warm": args.warm,
+                "scenarios": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nLínea base guardada en {args.baseline_file}")
+
+
+if __name__ == "__main__":
+    main()
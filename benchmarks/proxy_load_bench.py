@@ -0,0 +1,209 @@
+"""
+Prueba de carga de extremo a extremo del proxy contra el sustituto de Syntage.
+
+Levanta utils/syntageStandIn.py (latencia, errores, 429 y paginación
+configurables), apunta el proxy a él con SYNTAGE_BASE_URL y lo ejercita a
+una tasa fija de peticiones por segundo. La carga es de lazo abierto: cada
+petición sale a su hora programada aunque las anteriores no hayan terminado,
+y la latencia se mide desde esa hora (incluye la espera si el harness se
+atrasa), para no esconder las colas.
+
+Por defecto la app corre en proceso (httpx + ASGITransport), con el cache
+de respuestas en un archivo temporal y autenticación con
+middlewares/firebaseStandIn.py. Con --target se ejercita un servidor ya
+levantado (que debe tener SYNTAGE_BASE_URL apuntando al sustituto,
+FIREBASE_AUTH_STANDIN=true y DEVELOP=true).
+
+Rutas (--mix nombre=peso,...):
+    summary  GET  /summary/{entity_id}
+    risks    GET  /risk-calculations/{rfc}
+    vendors  GET  /vendor-network-insight/{entity_id}?limit=20
+    bundle   GET  /entities/{entity_id}/bundle?include=summary,scores,risks
+    by-ids   POST /map-to-evaluate-request-by-ids
+
+Reporta percentiles de latencia por ruta, códigos de respuesta y las llamadas
+que recibió upstream por ruta y código.
+
+Uso:
+    python -m benchmarks.proxy_load_bench --rps 50 --duration 20 --latency lognormal:80:0.5
+    python -m benchmarks.proxy_load_bench --entities 1000 --throttle-rate 0.05 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Tuple
+
+os.environ.setdefault("FIREBASE_PROJECT_ID", "bench-project")
+os.environ["FIREBASE_AUTH_STANDIN"] = "true"
+os.environ["DEVELOP"] = "true"
+os.environ.setdefault("SYNTAGE_API_KEY", "standin-key")
+
+_DEFAULT_MIX = "summary=4,risks=2,vendors=2,bundle=1,by-ids=1"
+
+
+def _request_for(route: str, entity_id: str, rfc: str):
+    """(método, ruta, cuerpo JSON) de una petición"""
+    if route == "summary":
+        return "GET", f"/summary/{entity_id}", None
+    if route == "risks":
+        return "GET", f"/risk-calculations/{rfc}", None
+    if route == "vendors":
+        return "GET", f"/vendor-network-insight/{entity_id}?limit=20", None
+    if route == "bundle":
+        return "GET", f"/entities/{entity_id}/bundle?include=summary,scores,risks&business_id={rfc}", None
+    if route == "by-ids":
+        return "POST", "/map-to-evaluate-request-by-ids", {"entity_id": entity_id, "business_id": rfc}
+    raise ValueError(f"Ruta desconocida: {route}")
+
+
+def _parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        _request_for(name.strip(), "e", "r")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _check_routes():
+    """Cada ruta del catálogo INSIGHTS debe estar servida por el sustituto"""
+    from controllers.syntage_data_controller import INSIGHTS
+    from utils.syntageStandIn import ROUTES
+
+    missing = [insight["path"] for insight in INSIGHTS.values() if insight["path"] not in ROUTES]
+    if missing:
+        raise SystemExit(f"❌ El sustituto no sirve: {', '.join(missing)}")
+
+
+def _in_process_app(keep_rate_limit: bool):
+    """App del proxy en proceso, con el cache de respuestas en un archivo temporal"""
+    from controllers.cacheController import cache
+    from middlewares import authMiddleware
+    from middlewares.rateLimiter import RateLimiter
+    from utils.evaluationCache import evaluation_cache
+    from main import app
+
+    if not keep_rate_limit:
+        # Un solo usuario a decenas de req/s: sin límites por usuario
+        authMiddleware.rate_limiter = RateLimiter(rate=0, burst=0, max_concurrent=0)
+    cache.cache_file = os.path.join(tempfile.mkdtemp(prefix="proxy-load-"), "cache.json")
+    cache.cache.clear()
+    cache.derived.clear()
+    evaluation_cache.clear()
+    return app
+
+
+async def _drive(client, rps: float, duration: float, mix: dict, entities: int, seed: int) -> Tuple[list, float]:
+    rnd = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    total = int(rps * duration)
+    loop = asyncio.get_running_loop()
+    results = []
+
+    async def one(route: str, scheduled: float, entity: int):
+        method, path, body = _request_for(route, f"ent-{entity:06d}", f"RFC{entity:06d}AB1")
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except Exception as error:
+            status = type(error).__name__
+        results.append((route, status, loop.time() - scheduled))
+
+    start = loop.time()
+    tasks = []
+    for index in range(total):
+        scheduled = start + index / rps
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route = rnd.choices(names, weights)[0]
+        tasks.append(asyncio.ensure_future(one(route, scheduled, rnd.randrange(entities))))
+    await asyncio.gather(*tasks)
+    return results, loop.time() - start
+
+
+def _percentile(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _report(results: list, elapsed: float, upstream: dict):
+    print(f"\n{len(results)} peticiones en {elapsed:.1f} s ({len(results) / elapsed:.1f} req/s)")
+    print(f"códigos: {dict(Counter(status for _, status, _ in results))}")
+
+    by_route = defaultdict(list)
+    for route, _, latency in results:
+        by_route[route].append(latency * 1000)
+    print(f"\n{'ruta':<10}{'n':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for route, latencies in sorted(by_route.items()):
+        latencies.sort()
+        print(f"{route:<10}{len(latencies):>7}{statistics.median(latencies):>10.1f}"
+              f"{_percentile(latencies, 0.90):>10.1f}{_percentile(latencies, 0.99):>10.1f}{latencies[-1]:>10.1f}")
+
+    print(f"\nllamadas a upstream: {upstream['requests']} "
+          f"({upstream['requests'] / max(len(results), 1):.2f} por petición)")
+    for route, statuses in sorted(upstream["routes"].items()):
+        print(f"  {route:<62}{statuses}")
+
+
+async def _run(args, upstream_server):
+    import httpx
+    from middlewares import firebaseStandIn
+
+    headers = {"Authorization": f"Bearer {firebaseStandIn.mint_token('load-test')}"}
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, headers=headers, timeout=args.timeout)
+    else:
+        transport = httpx.ASGITransport(app=_in_process_app(args.keep_rate_limit))
+        client = httpx.AsyncClient(transport=transport, base_url="http://proxy", headers=headers,
+                                   timeout=args.timeout)
+    async with client:
+        return await _drive(client, args.rps, args.duration, _parse_mix(args.mix), args.entities, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="segundos")
+    parser.add_argument("--mix", default=_DEFAULT_MIX)
+    parser.add_argument("--entities", type=int, default=100, help="entity_id/RFC distintos")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--target", help="URL de un proxy ya levantado (por defecto, en proceso)")
+    parser.add_argument("--keep-rate-limit", action="store_true", help="conservar el límite por usuario")
+    upstream = parser.add_argument_group("sustituto de Syntage")
+    upstream.add_argument("--upstream-port", type=int, default=0)
+    upstream.add_argument("--latency", default="lognormal:80:0.5")
+    upstream.add_argument("--error-rate", type=float, default=0.0)
+    upstream.add_argument("--throttle-rate", type=float, default=0.0)
+    upstream.add_argument("--rate-limit", type=float, default=0.0)
+    upstream.add_argument("--page-size", type=int, default=0)
+    args = parser.parse_args()
+
+    from utils.syntageStandIn import serve
+
+    server = serve(port=args.upstream_port, latency=args.latency, error_rate=args.error_rate,
+                   throttle_rate=args.throttle_rate, rate_limit=args.rate_limit,
+                   page_size=args.page_size, seed=args.seed)
+    if args.target:
+        print(f"Sustituto de Syntage en {server.url}: el proxy en {args.target} debe usar SYNTAGE_BASE_URL={server.url}")
+    else:
+        os.environ["SYNTAGE_BASE_URL"] = server.url
+    _check_routes()
+
+    try:
+        started = time.perf_counter()
+        results, elapsed = asyncio.run(_run(args, server))
+        _report(results, elapsed, server.standin.stats())
+        print(f"\nduración total (incluye peticiones pendientes): {time.perf_counter() - started:.1f} s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Generador sintético (con semilla) de solicitudes de map_to_evaluate_request.
+
+Produce summaryData, financialRatiosData, riskIndicatorsData,
+annualComparisonData y buroReportData con la forma que llega al endpoint:
+montos como texto, fechas en los cuatro formatos de _DATE_FORMATS (y algunas
+vacías o inválidas), claves de observación y historiales de pagos con la
+distribución de un reporte real: la mayoría sin atrasos y, en el resto,
+rachas de atraso que empeoran o se recuperan mes a mes.
+
+La misma semilla genera siempre las mismas solicitudes.
+"""
+
+import random
+from datetime import date, timedelta
+from typing import Optional
+
+_ADDRESSES = [
+    "CALLE JOSE MARIA MORELOS 5, TLALNEPANTLA, MEXICO",
+    "AV. REFORMA 222, CUAUHTEMOC, CIUDAD DE MEXICO",
+    "BLVD. PUERTA DE HIERRO 4965, ZAPOPAN, JALISCO",
+    "AV. CONSTITUCION 1500 OTE, CENTRO, MONTERREY, NUEVO LEON, C.P. 64000",
+    "CALLE 60 NUM 491, CENTRO, 97000 MERIDA, YUC.",
+    "",
+]
+_ACTIVITIES = [
+    "Comercio al por mayor", "Servicios de impresión", "Reparación de maquinaria",
+    "Comercializadora de abarrotes", "Servicios de cómputo", "Construcción de vivienda",
+    "Transporte de carga", "Otros",
+]
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%Y%m%d", "%d-%m-%Y")
+_OBSERVATION_KEYS = ["CA", "LC", "RV", "CV", "FD"]
+_REFERENCE_DATE = date(2025, 6, 1)
+
+
+def _amount(rnd: random.Random, low: int, high: int) -> str:
+    return str(rnd.randint(low, high))
+
+
+def _date(rnd: random.Random, earliest_year: int = 2010) -> Optional[str]:
+    """Fecha en un formato al azar; a veces vacía, nula o inválida"""
+    roll = rnd.random()
+    if roll < 0.02:
+        return rnd.choice(["", None, "2024-02-30", "N/A"])
+    days = (_REFERENCE_DATE - date(earliest_year, 1, 1)).days
+    value = _REFERENCE_DATE - timedelta(days=rnd.randint(0, days))
+    return value.strftime(_DATE_FORMATS[0] if roll < 0.7 else rnd.choice(_DATE_FORMATS))
+
+
+def payment_history(rnd: random.Random, months: int) -> str:
+    """
+    historicoPagos de `months` meses, del más reciente al más antiguo.
+    80% de los créditos sin atrasos; el resto sigue una cadena de Markov en
+    la que cada mes el atraso empeora, se mantiene o se regulariza.
+    Algunos meses vienen sin información ("-").
+    """
+    if rnd.random() < 0.8:
+        return "0" * months
+    level = 0
+    codes = []
+    for _ in range(months):
+        roll = rnd.random()
+        if level == 0:
+            level = 1 if roll < 0.1 else 0
+        elif roll < 0.35:
+            level = min(level + 1, 7)
+        elif roll < 0.7:
+            level = 0
+        codes.append("-" if rnd.random() < 0.02 else str(level))
+    return "".join(codes)
+
+
+def credit_line(rnd: random.Random) -> dict:
+    """Crédito financiero de Buró con los campos que usa el mapping y algunos que no"""
+    credit = {
+        "numeroCuenta": _amount(rnd, 10**9, 10**10),
+        "tipoCredito": rnd.choice(["1380", "SIMPLE", "REVOLVENTE"]),
+        "atrasoMayor": str(rnd.choice([0, 0, 0, 0, 5, 15, 35, 95])),
+        "historicoPagos": payment_history(rnd, rnd.randint(1, 48)),
+        "apertura": _date(rnd),
+        "creditoMaximoUtilizado": _amount(rnd, 10_000, 5_000_000),
+        "saldoInicial": _amount(rnd, 10_000, 5_000_000),
+        "saldoVigente": _amount(rnd, 0, 1_000_000),
+        "saldoVencidoDe1a29Dias": str(rnd.choice([0, 0, 0, 1500, 12000])),
+        "saldoVencidoDe30a59Dias": str(rnd.choice([0, 0, 0, 0, 8000])),
+        "saldoVencidoDe60a89Dias": str(rnd.choice([0, 0, 0, 0, 0, 4000])),
+        "saldoVencidoDe90a119Dias": "0",
+        "saldoVencidoDe120a179Dias": "0",
+        "saldoVencidoDe180DiasOMas": str(rnd.choice([0] * 19 + [250000])),
+    }
+    if rnd.random() < 0.3:
+        credit["fechaCierre"] = _date(rnd)
+    if rnd.random() < 0.1:
+        credit["claveObservacion"] = rnd.choice(_OBSERVATION_KEYS)
+    return credit
+
+
+def generate_request(rnd: random.Random, credit_lines: int) -> dict:
+    """Una solicitud completa con exactamente `credit_lines` créditos financieros"""
+    years = rnd.randint(1, 6)
+    last_year = _REFERENCE_DATE.year - 1
+    ratio_years = [str(last_year - offset) for offset in range(rnd.randint(1, 3))]
+    return {
+        "summaryData": {
+            "rfc": f"SIN{rnd.randint(0, 999999):06d}{rnd.choice('ABC')}{rnd.randint(10, 99)}",
+            "lastYearNetIncome": float(rnd.randint(-5_000_000, 10_000_000)),
+            "lastYearTotalIncome": rnd.randint(100_000, 50_000_000),
+            "fiscalAddress": rnd.choice(_ADDRESSES),
+            "fiscalAddressStatusRaw": rnd.choice([None, "LOCALIZADO", "NO LOCALIZADO"]),
+            "registrationDate": _date(rnd, 1995),
+            "economicActivities": [
+                {"name": rnd.choice(_ACTIVITIES), "percentage": percentage}
+                for percentage in rnd.choice([[100], [70, 30], [50, 30, 20]])
+            ],
+        },
+        "financialRatiosData": {
+            "liquidity": {"current_ratio": {year: str(rnd.uniform(0.2, 3)) for year in ratio_years}},
+            "leverage": {"total_debt_ratio": {year: str(rnd.uniform(0.1, 1.2)) for year in ratio_years}},
+            "profitability": {"return_on_assets": {year: str(rnd.uniform(-0.3, 0.5)) for year in ratio_years}},
+        },
+        "riskIndicatorsData": {"data": {
+            "taxCompliance": {"risky": rnd.random() < 0.2},
+            "blacklistedCounterparties": {"value": rnd.choice([0, 0, 0, 1])},
+            "canceledIssuedInvoices": {"risky": rnd.random() < 0.1},
+        }},
+        "annualComparisonData": {"items": [
+            {"period": str(last_year - years + 1 + i), "netIncome": _amount(rnd, 100_000, 9_000_000)}
+            for i in range(years)
+        ]},
+        "buroReportData": {"Buro": [{"data": {
+            "creditoFinanciero": [credit_line(rnd) for _ in range(credit_lines)],
+            "creditoComercial": [{"saldoVencido": str(rnd.choice([0, 0, 2000]))}
+                                 for _ in range(rnd.randint(0, 3))],
+        }}]},
+    }
+
+
+def generate_applicants(count: int, credits: int, seed: int = 7) -> list:
+    """Solicitudes sintéticas con hasta `credits` líneas de crédito financieras cada una"""
+    rnd = random.Random(seed)
+    return [generate_request(rnd, rnd.randint(0, credits)) for _ in range(count)]
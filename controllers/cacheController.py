@@ -2,11 +2,14 @@ import time
 import json
 import os
 from threading import Lock
+from urllib.parse import urlsplit
 
 class SimpleCache:
     def __init__(self, cache_file='cache.json'):
         self.cache_file = cache_file
         self.cache = {}
+        # Valores derivados de cada entrada (p. ej. índices); solo en memoria
+        self.derived = {}
         self.lock = Lock()
         self._load_cache()
 
@@ -35,12 +38,87 @@ class SimpleCache:
                     return data
                 else:
                     del self.cache[key]
+                    self.derived.pop(key, None)
             return None
 
     def set(self, key, value, ttl=300):  # ttl en segundos, default 5 minutos
         with self.lock:
             self.cache[key] = (value, time.time() + ttl)
+            self.derived.pop(key, None)
             self._save_cache()
 
-# Instancia global del cache
-cache = SimpleCache()
\ No newline at end of file
+    def get_derived(self, key, name, builder):
+        """
+        Devuelve un valor derivado de la entrada `key`, construyéndolo con
+        builder(value) solo la primera vez. Se descarta al reemplazar o
+        expirar la entrada. Retorna None si la entrada no existe.
+        """
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None or time.time() >= entry[1]:
+                return None
+            derived = self.derived.get(key)
+            if derived is not None and name in derived:
+                return derived[name]
+            value = entry[0]
+
+        # Construir fuera del lock para no bloquear otros get/set
+        built = builder(value)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] is value:
+                self.derived.setdefault(key, {})[name] = built
+        return built
+
+class SnapshotCache:
+    """
+    Cache de solo lectura cargado de un snapshot con el formato de cache.json,
+    para el modo offline (SYNTAGE_OFFLINE_SNAPSHOT). Ignora la expiración y
+    busca por ruta y query, así que un snapshot del sandbox sirve con
+    cualquier base URL. set no guarda nada: en modo offline no hay upstream.
+    """
+
+    def __init__(self, snapshot_file):
+        self.snapshot_file = snapshot_file
+        with open(snapshot_file, 'r') as f:
+            data = json.load(f)
+        self.cache = {self.key(url): entry['value'] for url, entry in data.items()}
+        self.derived = {}
+        self.lock = Lock()
+
+    @staticmethod
+    def key(url):
+        """Llave del snapshot de una URL: ruta y query, sin esquema ni host"""
+        parts = urlsplit(url)
+        return parts.path + (f"?{parts.query}" if parts.query else "")
+
+    def get(self, key):
+        return self.cache.get(self.key(key))
+
+    def set(self, key, value, ttl=300):
+        pass
+
+    def get_derived(self, key, name, builder):
+        """Igual que SimpleCache.get_derived; las entradas nunca expiran"""
+        key = self.key(key)
+        with self.lock:
+            value = self.cache.get(key)
+            if value is None:
+                return None
+            derived = self.derived.get(key)
+            if derived is not None and name in derived:
+                return derived[name]
+
+        built = builder(value)
+        with self.lock:
+            self.derived.setdefault(key, {})[name] = built
+        return built
+
+
+# Instancia global del cache; con SYNTAGE_OFFLINE_SNAPSHOT se sirve solo del snapshot
+offline_snapshot = os.getenv("SYNTAGE_OFFLINE_SNAPSHOT")
+if offline_snapshot:
+    cache = SnapshotCache(offline_snapshot)
+    print(f"⚠️ SYNTAGE_OFFLINE_SNAPSHOT activo: se sirve solo desde {offline_snapshot} ({len(cache.cache)} entradas), sin consultar Syntage.")
+else:
+    cache = SimpleCache()
\ No newline at end of file
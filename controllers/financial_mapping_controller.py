@@ -1,7 +1,32 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import Dict, Any, Optional, List
-from utils.financialCalcs import map_to_evaluate_request
+import os
+import json
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+import httpx
+from fastapi import APIRouter, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from typing import AsyncIterator, Dict, Any, Optional, List, Tuple
+from utils.buroSchema import InvalidRequestError, decode_evaluate_request, map_json_to_evaluate_request
+from utils.evaluationCache import evaluation_cache
 from pydantic import BaseModel, Field
+from .syntage_data_controller import fetch_insight
+
+# Procesos para el mapping por lote (por defecto, uno por CPU) y máximo de
+# solicitudes en vuelo por petición: al llenarse se deja de leer la entrada
+mapping_pool_workers = int(os.getenv("MAPPING_POOL_WORKERS", "0")) or os.cpu_count() or 1
+mapping_batch_window = int(os.getenv("MAPPING_BATCH_WINDOW", "0")) or 4 * mapping_pool_workers
+# Tamaño máximo de una línea del lote; una línea más larga se descarta sin
+# guardarla y se responde con un error 413 en su lugar
+mapping_batch_max_line_bytes = int(os.getenv("MAPPING_BATCH_MAX_LINE_BYTES", "0")) or 1024 * 1024
+_mapping_pool: Optional[ProcessPoolExecutor] = None
+# El servidor ya corre otros hilos (threadpool, renovación de claves): hacer fork
+# de un proceso con hilos puede dejar al hijo bloqueado en un lock heredado
+_mapping_pool_start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
 
 # Crear el enrutador para las rutas del mapping financiero
 router = APIRouter()
@@ -162,62 +187,70 @@ class EvaluateResponse(BaseModel):
     comp: Dict[str, Any] = Field(description="Datos de cumplimiento")
     geo: Dict[str, Any] = Field(description="Datos geográficos")
 
+# Ejemplo del cuerpo de /map-to-evaluate-request para la documentación OpenAPI
+_EVALUATE_REQUEST_EXAMPLE = {
+    "summaryData": {
+        "rfc": "CDV14100WEDA",
+        "lastYearNetIncome": 19339633
+    },
+    "financialRatiosData": {},
+    "riskIndicatorsData": {},
+    "annualComparisonData": {},
+    "buroReportData": {
+        "Buro": [
+            {
+                "id": "example-id",
+                "provider": "Buro",
+                "data": {
+                    "score": [{"valorScore": "750"}],
+                    "creditoFinanciero": []
+                }
+            }
+        ]
+    }
+}
+
+
 @router.post(
     "/map-to-evaluate-request",
     response_model=EvaluateResponse,
     summary="Mapear datos financieros (formato flexible)",
-    description="Versión alternativa que acepta cualquier estructura JSON sin validación estricta, incluyendo datos de buró de crédito"
-)
-async def map_to_evaluate_request_raw_endpoint(
-    request_data: Dict[str, Any] = Body(
-        ...,
-        example={
-            "summaryData": {
-                "rfc": "CDV14100WEDA",
-                "lastYearNetIncome": 19339633
+    description="Versión alternativa que acepta cualquier estructura JSON sin validación estricta, incluyendo datos de buró de crédito",
+    # El cuerpo se lee crudo (ver el docstring); aquí solo se documenta
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "object", "additionalProperties": True},
+                    "example": _EVALUATE_REQUEST_EXAMPLE,
+                }
             },
-            "financialRatiosData": {},
-            "riskIndicatorsData": {},
-            "annualComparisonData": {},
-            "buroReportData": {
-                "Buro": [
-                    {
-                        "id": "example-id",
-                        "provider": "Buro",
-                        "data": {
-                            "score": [{"valorScore": "750"}],
-                            "creditoFinanciero": []
-                        }
-                    }
-                ]
-            }
         }
-    )
-):
+    },
+)
+async def map_to_evaluate_request_raw_endpoint(request: Request):
     """
     Versión alternativa del endpoint que acepta Dict directamente.
     Útil para integraciones legacy o cuando no se conoce la estructura exacta.
     Ahora incluye soporte para datos de buró de crédito (buroReportData).
+
+    El cuerpo se recibe como bytes: una solicitud idéntica ya evaluada hoy se
+    responde desde el cache sin decodificarla. Si no, se decodifica con
+    utils/buroSchema.py (los créditos de Buró como structs tipados, con la
+    versión con dicts si no encaja en el esquema) y, si el RFC ya se evaluó,
+    solo se recalculan las secciones que cambiaron.
     """
+    body = await request.body()
+
+    def decode():
+        try:
+            return decode_evaluate_request(body)
+        except InvalidRequestError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        # Validación mínima
-        if not isinstance(request_data, dict):
-            raise HTTPException(
-                status_code=400,
-                detail="Request body must be a JSON object"
-            )
-        
-        if not request_data.get("summaryData"):
-            raise HTTPException(
-                status_code=400,
-                detail="summaryData is required"
-            )
-        
-        # Llamar a la función de mapping (ahora incluye buroReportData)
-        result = map_to_evaluate_request(request_data)
-        
-        return result
-        
+        return evaluation_cache.evaluate(decode, datetime.now(), raw=body)
     except HTTPException:
         raise
     except Exception as e:
@@ -226,7 +259,198 @@ async def map_to_evaluate_request_raw_endpoint(
             detail=f"Error processing financial mapping: {str(e)}"
         )
 
-@router.post("/map-to-evaluate-request-by-ids")
+@router.get(
+    "/map-to-evaluate-request/cache-stats",
+    summary="Estadísticas del cache de mapping",
+    description="Aciertos, fallos y tamaño del cache de resultados de /map-to-evaluate-request"
+)
+async def get_evaluation_cache_stats():
+    return evaluation_cache.stats()
+
+
+def _get_mapping_pool() -> ProcessPoolExecutor:
+    """Pool de procesos compartido, creado en el primer uso"""
+    global _mapping_pool
+    if _mapping_pool is None:
+        _mapping_pool = ProcessPoolExecutor(
+            max_workers=mapping_pool_workers,
+            mp_context=multiprocessing.get_context(_mapping_pool_start_method),
+        )
+    return _mapping_pool
+
+
+def _discard_mapping_pool(pool: ProcessPoolExecutor):
+    """Descarta un pool roto (p. ej. un proceso murió) para que el siguiente uso cree otro"""
+    global _mapping_pool
+    if _mapping_pool is pool:
+        _mapping_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_mapping_pool():
+    """Termina los procesos del pool al apagar la app (también en cada recarga de --reload)"""
+    global _mapping_pool
+    pool, _mapping_pool = _mapping_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que no escucha la desconexión en paralelo.
+    Con ASGI < 2.4, StreamingResponse consume receive() mientras transmite y se
+    llevaría el cuerpo que el generador todavía está leyendo. La desconexión se
+    detecta igual: request.stream() lanza ClientDisconnect y send() falla
+    (el OSError de send() se convierte en ClientDisconnect, como en Starlette).
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+class LineTooLongError(Exception):
+    """Una línea del lote supera MAPPING_BATCH_MAX_LINE_BYTES"""
+
+
+async def _ndjson_lines(request: Request, max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Líneas no vacías del cuerpo NDJSON con su número (base 1), a medida que llegan.
+    Solo se busca el fin de línea en los bytes nuevos de cada chunk, y de una
+    línea de más de max_line_bytes no se guarda nada: se entrega como None.
+    """
+    parts: List[bytes] = []
+    size = 0
+    line_number = 0
+    async for chunk in request.stream():
+        start = 0
+        end = chunk.find(b"\n")
+        while end >= 0:
+            line_number += 1
+            if size + end - start > max_line_bytes:
+                yield line_number, None
+            else:
+                parts.append(chunk[start:end])
+                line = b"".join(parts)
+                if line.strip():
+                    yield line_number, line
+            parts.clear()
+            size = 0
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        size += len(chunk) - start
+        if size > max_line_bytes:
+            parts.clear()
+        else:
+            parts.append(chunk[start:])
+    if size > max_line_bytes:
+        yield line_number + 1, None
+    else:
+        line = b"".join(parts)
+        if line.strip():
+            yield line_number + 1, line
+
+
+async def _batch_result_line(line_number: int, future: "asyncio.Future[Dict[str, Any]]") -> str:
+    line: Dict[str, Any] = {"line": line_number}
+    try:
+        line["data"] = await future
+    except InvalidRequestError as e:
+        line["error"] = {"status_code": 400, "detail": str(e)}
+    except LineTooLongError as e:
+        line["error"] = {"status_code": 413, "detail": str(e)}
+    except Exception as e:
+        line["error"] = {"status_code": 500, "detail": f"Error processing financial mapping: {str(e)}"}
+    return json.dumps(line, ensure_ascii=False) + "\n"
+
+
+@router.post(
+    "/map-to-evaluate-request/batch",
+    summary="Mapear muchas solicitudes (NDJSON)",
+    description="Recibe NDJSON (una solicitud de /map-to-evaluate-request por línea) y devuelve NDJSON en el mismo orden"
+)
+async def map_to_evaluate_request_batch_endpoint(request: Request):
+    """
+    Mapping por lote en un pool de procesos.
+
+    Entrada (application/x-ndjson): una solicitud por línea, con el mismo formato
+    que /map-to-evaluate-request. Se lee a medida que llega.
+
+    Salida (application/x-ndjson), en el orden de entrada:
+        {"line": 1, "data": {"fin": ..., "ch": ..., "comp": ..., "geo": ...}}
+        {"line": 2, "error": {"status_code": 400, "detail": "summaryData is required"}}
+
+    Cada línea se decodifica y mapea en MAPPING_POOL_WORKERS procesos, fuera del
+    event loop. Hay como máximo MAPPING_BATCH_WINDOW solicitudes en vuelo: si el
+    cliente no lee la respuesta o los procesos van atrás, se deja de leer la
+    entrada. Una línea de más de MAPPING_BATCH_MAX_LINE_BYTES se responde con
+    un error 413 sin leerla a memoria. Todas las líneas usan la misma fecha de
+    referencia.
+    """
+    async def stream_results():
+        loop = asyncio.get_running_loop()
+        pool = _get_mapping_pool()
+        now = datetime.now()
+        pending = deque()
+        try:
+            async for line_number, line in _ndjson_lines(request, mapping_batch_max_line_bytes):
+                if line is None:
+                    future = loop.create_future()
+                    future.set_exception(LineTooLongError(
+                        f"Line exceeds {mapping_batch_max_line_bytes} bytes (MAPPING_BATCH_MAX_LINE_BYTES)"
+                    ))
+                else:
+                    try:
+                        future = loop.run_in_executor(pool, map_json_to_evaluate_request, line, now)
+                    except BrokenProcessPool:
+                        _discard_mapping_pool(pool)
+                        pool = _get_mapping_pool()
+                        future = loop.run_in_executor(pool, map_json_to_evaluate_request, line, now)
+                pending.append((line_number, future))
+                # Emitir en orden lo que ya terminó; esperar si la ventana está llena
+                while pending and (len(pending) >= mapping_batch_window or pending[0][1].done()):
+                    yield await _batch_result_line(*pending.popleft())
+            while pending:
+                yield await _batch_result_line(*pending.popleft())
+        finally:
+            # Si el cliente se desconecta, no seguir mapeando
+            for _, future in pending:
+                future.cancel()
+
+    return _DuplexStreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+def _build_request_from_sources(
+    summary: Dict[str, Any],
+    ratios: Dict[str, Any],
+    risks: Dict[str, Any],
+    annual: Dict[str, Any],
+    buro_reports: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Adapta las respuestas crudas de Syntage a la estructura que espera
+    map_to_evaluate_request (summaryData, financialRatiosData, ...).
+    """
+    # Usar primero el reporte de buró más reciente
+    buro_members = sorted(
+        (buro_reports or {}).get("hydra:member") or [],
+        key=lambda member: member.get("createdAt") or "",
+        reverse=True,
+    )
+    return {
+        "summaryData": summary or {},
+        "financialRatiosData": (ratios or {}).get("data") or {},
+        "riskIndicatorsData": risks or {},
+        "annualComparisonData": {"items": (annual or {}).get("hydra:member") or []},
+        "buroReportData": {"Buro": buro_members},
+    }
+
+
+@router.post("/map-to-evaluate-request-by-ids", response_model=EvaluateResponse)
 async def map_to_evaluate_request_by_ids_endpoint(
     request_data: Dict[str, Any] = Body(...)
 ):
@@ -242,28 +466,57 @@ async def map_to_evaluate_request_by_ids_endpoint(
         "geographic_data": {...} (opcional)
     }
     
+    Las fuentes (summary, financial-ratios, risks, invoicing-annual-comparison
+    y reportes de buró) se consultan en paralelo a través del cache. Si la
+    entidad no tiene reportes de buró (lista vacía o 404), la sección ch se
+    calcula vacía; cualquier otro error al consultar el buró (5xx, 429,
+    timeouts, autenticación) se propaga como el de las demás fuentes, para no
+    presentar un historial limpio cuando en realidad no se pudo consultar.
+    credit_bureau_data y geographic_data, si se envían, reemplazan ch y geo.
+    
     Retorna un objeto con formato EvaluateRequest: {fin, ch, comp, geo}
     """
+    entity_id = request_data.get("entity_id")
+    business_id = request_data.get("business_id")
+
+    # Validar que los IDs estén presentes
+    if not entity_id:
+        raise HTTPException(status_code=400, detail="entity_id is required")
+    if not business_id:
+        raise HTTPException(status_code=400, detail="business_id is required")
+
+    async with httpx.AsyncClient() as client:
+        summary, ratios, risks, annual, buro_reports = await asyncio.gather(
+            fetch_insight("summary", entity_id, client),
+            fetch_insight("financial-ratios", business_id, client),
+            fetch_insight("risks", business_id, client),
+            fetch_insight("invoicing-annual-comparison", entity_id, client),
+            fetch_insight("buro-de-credito", entity_id, client),
+            return_exceptions=True,
+        )
+
+    # Sin reportes de buró (404) ch queda vacío; cualquier otro error del buró
+    # se propaga igual que el de las demás fuentes
+    if isinstance(buro_reports, HTTPException) and buro_reports.status_code == 404:
+        buro_reports = {}
+    for source in (summary, ratios, risks, annual, buro_reports):
+        if isinstance(source, BaseException):
+            raise source
+
+    if not summary:
+        raise HTTPException(status_code=404, detail="summaryData not available for entity")
+
     try:
-        entity_id = request_data.get("entity_id")
-        business_id = request_data.get("business_id")
-        
-        # Validar que los IDs estén presentes
-        if not entity_id:
-            raise HTTPException(status_code=400, detail="entity_id is required")
-        if not business_id:
-            raise HTTPException(status_code=400, detail="business_id is required")
-        
-        # TODO: Aquí se podrían hacer llamadas internas a los otros endpoints
-        # para obtener los datos automáticamente. Por ahora, devolvemos un mensaje
-        # indicando que esta funcionalidad requiere implementación adicional.
-        
-        return {
-            "message": "Esta funcionalidad requiere integración con los endpoints existentes",
-            "entity_id": entity_id,
-            "business_id": business_id,
-            "note": "Use el endpoint /map-to-evaluate-request con datos completos por ahora"
-        }
-        
+        # Tras una nueva consulta de buró solo se recalcula ch
+        result = evaluation_cache.evaluate(
+            _build_request_from_sources(summary, ratios, risks, annual, buro_reports)
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+    if request_data.get("credit_bureau_data"):
+        result["ch"] = request_data["credit_bureau_data"]
+    if request_data.get("geographic_data"):
+        result["geo"] = request_data["geographic_data"]
+
+    return result
@@ -1,534 +1,437 @@
 import os
-from fastapi import APIRouter, HTTPException, Body, Form
+import json
+import asyncio
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import httpx
-from .cacheController import cache
+from .cacheController import cache, offline_snapshot
+from utils.projection import compile_projection, project
+from utils.sortIndex import build_sort_index, paginate
+from utils.upstreamRecorder import upstream_get
 
-# Configurar base URL según variable de entorno
+# Configurar base URL según variable de entorno; SYNTAGE_BASE_URL la reemplaza
+# (p. ej. el sustituto local de utils/syntageStandIn.py)
 develop = os.getenv("DEVELOP") == "true"
-base_url = "https://api.sandbox.syntage.com" if develop else "https://api.syntage.com"
+base_url = os.getenv("SYNTAGE_BASE_URL", "").rstrip("/") or (
+    "https://api.sandbox.syntage.com" if develop else "https://api.syntage.com"
+)
+
+# Máximo de peticiones simultáneas hacia Syntage, compartido por todos los endpoints
+max_upstream_concurrency = int(os.getenv("SYNTAGE_MAX_CONCURRENCY", "10"))
+_upstream_semaphore = asyncio.Semaphore(max_upstream_concurrency)
+# Parte de ese límite que pueden ocupar el bundle y /insights/batch: el resto
+# queda libre para los endpoints de un solo insight
+max_batch_concurrency = min(
+    int(os.getenv("SYNTAGE_BATCH_MAX_CONCURRENCY", "0")) or max(1, max_upstream_concurrency // 2),
+    max_upstream_concurrency,
+)
+_batch_semaphore = asyncio.Semaphore(max_batch_concurrency)
+# Máximo de consultas (entidades x insights) por llamada a /insights/batch
+max_batch_items = int(os.getenv("SYNTAGE_BATCH_MAX_ITEMS", "500"))
 
 # Crear el enrutador para las rutas de la API
 router = APIRouter()
 
-
-@router.get("/invoicing-annual-comparison/{entity_id}")
-async def get_invoicing_annual_comparison(entity_id: str):
+# Catálogo de insights de Syntage: nombre -> parámetro del endpoint de un solo
+# insight ("entity_id" o "business_id"), ruta upstream, cabeceras extra e índice
+# opcional que se construye al llenar el cache.
+# "{id}" se sustituye por el valor de ese parámetro.
+INSIGHTS: Dict[str, Dict[str, Any]] = {
+    "invoicing-annual-comparison": {"param": "entity_id", "path": "/entities/{id}/insights/metrics/invoicing-annual-comparison"},
+    "financial-ratios": {"param": "business_id", "path": "/insights/{id}/financial-ratios"},
+    "vendor-network": {"param": "entity_id", "path": "/entities/{id}/insights/metrics/vendor-network", "index": build_sort_index},
+    "customer-network": {"param": "entity_id", "path": "/entities/{id}/insights/metrics/customer-network", "index": build_sort_index},
+    "customer-concentration": {"param": "entity_id", "path": "/insights/{id}/customer-concentration"},
+    "financial-institutions": {"param": "business_id", "path": "/insights/{id}/financial-institutions"},
+    "supplier-concentration": {"param": "business_id", "path": "/insights/{id}/supplier-concentration"},
+    "employees": {"param": "business_id", "path": "/insights/{id}/employees"},
+    "expenditures": {"param": "business_id", "path": "/insights/{id}/expenditures"},
+    "government-customers": {"param": "business_id", "path": "/insights/{id}/government-customers"},
+    "invoicing-blacklist": {"param": "business_id", "path": "/insights/{id}/invoicing-blacklist"},
+    "risks": {"param": "business_id", "path": "/insights/{id}/risks"},
+    "sales-revenue": {"param": "business_id", "path": "/insights/{id}/sales-revenue"},
+    "trial-balance": {"param": "business_id", "path": "/insights/{id}/trial-balance"},
+    "scores": {"param": "entity_id", "path": "/entities/{id}/insights/metrics/scores", "headers": {"accept-language": "es"}},
+    "cash-flow": {"param": "business_id", "path": "/insights/{id}/cash-flow"},
+    "summary": {"param": "entity_id", "path": "/insights/{id}/summary", "headers": {"accept-language": "es"}},
+    "buro-de-credito": {"param": "entity_id", "path": "/entities/{id}/datasources/mx/buro-de-credito/reports"},
+}
+
+
+SORT_INDEX = "sort_index"
+
+
+async def _fetch_cached(
+    url: str,
+    headers: Dict[str, str],
+    client: Optional[httpx.AsyncClient] = None,
+    index_builder: Optional[Callable[[Any], Any]] = None,
+    batch: bool = False,
+) -> Any:
+    """
+    Obtiene una URL de Syntage pasando por el cache.
+    Si no se recibe un cliente se abre uno para esta única petición.
+    Con index_builder, el índice se construye una vez al llenar el cache.
+    Con batch, la consulta a upstream ocupa además un lugar de SYNTAGE_BATCH_MAX_CONCURRENCY.
+    """
+    # Verificar cache
+    cached_data = cache.get(url)
+    if cached_data is not None:
+        return cached_data
+
+    if offline_snapshot:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Not found in offline snapshot {offline_snapshot}: {cache.key(url)}",
+        )
+
+    if client is None:
+        async with httpx.AsyncClient() as own_client:
+            return await _fetch_cached(url, headers, own_client, index_builder, batch)
+
+    # Con SYNTAGE_RECORD_DIR/SYNTAGE_REPLAY_DIR se graba o reproduce (utils/upstreamRecorder.py).
+    # El lugar de lote se toma primero para no ocupar uno global mientras se espera
+    async with _batch_semaphore if batch else nullcontext(), _upstream_semaphore:
+        response = await upstream_get(client, url, headers)
+    response.raise_for_status()
+    data = response.json()
+    # Cachear la respuesta
+    cache.set(url, data)
+    if index_builder is not None:
+        cache.get_derived(url, SORT_INDEX, index_builder)
+    return data
+
+
+def _api_key() -> str:
+    """API key de Syntage; en modo offline no se usa y puede faltar"""
+    api_key = os.getenv("SYNTAGE_API_KEY")
+    if not api_key and not offline_snapshot:
+        raise HTTPException(status_code=500, detail="API key not configured")
+    return api_key or ""
+
+
+async def fetch_insight(
+    name: str, resource_id: str, client: Optional[httpx.AsyncClient] = None, batch: bool = False
+) -> Any:
+    """
+    Resuelve un insight del catálogo INSIGHTS a través del cache.
+    Los errores se traducen a HTTPException igual que en los endpoints proxy.
+    batch=True para las consultas de endpoints de varios insights (ver _fetch_cached).
+    """
     try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        url = f"{base_url}/entities/{entity_id}/insights/metrics/invoicing-annual-comparison"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
+        api_key = _api_key()
+        insight = INSIGHTS[name]
+        url = base_url + insight["path"].format(id=resource_id)
+        headers = {"X-API-Key": api_key, **insight.get("headers", {})}
+        return await _fetch_cached(url, headers, client, insight.get("index"), batch)
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
+    except httpx.TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"Timeout from external API: {e}")
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=502, detail=f"Error connecting to external API: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
 
 
+# Parámetro ?fields= común a los endpoints proxy
+FIELDS_QUERY = Query(
+    None,
+    description="Proyección de campos, p. ej. hydra:member(period,netIncome). Ver utils/projection.py.",
+)
+
+
+def _validate_fields(fields: Optional[str]) -> None:
+    """Compila ?fields= antes de consultar upstream para rechazar expresiones inválidas"""
+    if fields:
+        try:
+            compile_projection(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid fields expression: {e}")
+
+
+async def _proxy_insight(name: str, resource_id: str, fields: Optional[str]) -> Any:
+    """Resuelve un insight y, si se pide, devuelve solo los campos seleccionados"""
+    _validate_fields(fields)
+    return project(await fetch_insight(name, resource_id), fields)
+
+
+def _resource_id(name: str, entity_id: str, business_id: Optional[str]) -> str:
+    """
+    Id con el que se pide un insight: el mismo parámetro que usa su endpoint de
+    un solo insight, para compartir URL upstream y entrada de cache con él.
+    Sin business_id se usa el entity_id.
+    """
+    if business_id and INSIGHTS[name]["param"] == "business_id":
+        return business_id
+    return entity_id
+
+
+def _parse_insight_names(names: List[str]) -> List[str]:
+    """Valida nombres de insights contra el catálogo y elimina duplicados"""
+    names = [n.strip() for n in names if n and n.strip()]
+    unknown = [n for n in names if n not in INSIGHTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown insights: {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
+
+def _error_detail(error: BaseException) -> Dict[str, Any]:
+    if isinstance(error, HTTPException):
+        return {"status_code": error.status_code, "detail": error.detail}
+    return {"status_code": 500, "detail": f"Error fetching data: {error}"}
+
+
+@router.get("/invoicing-annual-comparison/{entity_id}")
+async def get_invoicing_annual_comparison(entity_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("invoicing-annual-comparison", entity_id, fields)
+
+
 # Endpoint para obtener financial ratios
 @router.get("/financial-ratios/{business_id}")
-async def get_financial_ratios(business_id: str):
+async def get_financial_ratios(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("financial-ratios", business_id, fields)
+
+
+async def _paged_insight(
+    name: str,
+    resource_id: str,
+    limit: Optional[int],
+    offset: int,
+    sort: Optional[str],
+    fields: Optional[str],
+) -> Any:
+    """Pagina y ordena una colección del cache usando su índice precalculado"""
+    _validate_fields(fields)
+    data = await fetch_insight(name, resource_id)
+    if limit is None and not offset and not sort:
+        return project(data, fields)
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=502, detail="Unexpected collection format from external API")
+
+    insight = INSIGHTS[name]
+    url = base_url + insight["path"].format(id=resource_id)
+    index = cache.get_derived(url, SORT_INDEX, insight["index"])
+    if index is None:
+        # La entrada expiró entre la consulta y el paginado
+        index = insight["index"](data)
     try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        url = f"{base_url}/insights/{business_id}/financial-ratios"
-        headers = {"X-API-Key": api_key}
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+        page = paginate(data, index, limit, offset, sort)
+    except KeyError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort field '{sort.lstrip('-')}'. Available: {', '.join(sorted(index))}",
+        )
+    return project(page, fields)
 
 
 @router.get("/vendor-network-insight/{entity_id}")
-async def get_vendor_network_insight(entity_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        url = f"{base_url}/entities/{entity_id}/insights/metrics/vendor-network"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_vendor_network_insight(
+    entity_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    sort: Optional[str] = Query(None, description="Campo de ordenamiento; prefijo '-' para descendente"),
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    return await _paged_insight("vendor-network", entity_id, limit, offset, sort, fields)
 
 
 @router.get("/customer-network-insight/{entity_id}")
-async def get_customer_network_insight(entity_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        url = f"{base_url}/entities/{entity_id}/insights/metrics/customer-network"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_customer_network_insight(
+    entity_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    sort: Optional[str] = Query(None, description="Campo de ordenamiento; prefijo '-' para descendente"),
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    return await _paged_insight("customer-network", entity_id, limit, offset, sort, fields)
 
 
 @router.get("/customer-invoice-concentration/{entity_id}")
-async def get_customer_invoice_concentration(entity_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        url = f"{base_url}/insights/{entity_id}/customer-concentration"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_customer_invoice_concentration(entity_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("customer-concentration", entity_id, fields)
 
 
 # Nuevo endpoint para obtener instituciones financieras
 @router.get("/financial-institutions/{business_id}")
-async def get_financial_institutions(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/financial-institutions"
-        headers = {"X-API-Key": api_key}
-
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_financial_institutions(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("financial-institutions", business_id, fields)
 
 
 @router.get("/supplier-invoice-concentration/{business_id}")
-async def get_supplier_invoice_concentration(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/supplier-concentration"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_supplier_invoice_concentration(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("supplier-concentration", business_id, fields)
 
 
 @router.get("/employees/{business_id}")
-async def get_employees(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/employees"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_employees(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("employees", business_id, fields)
 
 
 @router.get("/expenditures/{business_id}")
-async def get_expenditures(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        url = f"{base_url}/insights/{business_id}/expenditures"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_expenditures(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("expenditures", business_id, fields)
 
 
 @router.get("/government-customers/{business_id}")
-async def get_government_customers(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/government-customers"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-    
+async def get_government_customers(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("government-customers", business_id, fields)
+
+
 @router.get("/invoicing-blacklist/{business_id}")
-async def get_invoicing_blacklist(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/invoicing-blacklist"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-    
+async def get_invoicing_blacklist(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("invoicing-blacklist", business_id, fields)
+
+
 @router.get("/risk-calculations/{business_id}")
-async def get_risks(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/risks"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-    
+async def get_risks(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("risks", business_id, fields)
+
+
 @router.get("/sales-revenue/{business_id}")
-async def get_sales_revenue(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/sales-revenue"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-    
+async def get_sales_revenue(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("sales-revenue", business_id, fields)
+
+
 @router.get("/trial-balance/{business_id}")
-async def get_trial_balance(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/trial-balance"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-    
+async def get_trial_balance(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("trial-balance", business_id, fields)
+
+
 @router.get("/scores/{entity_id}")
-async def get_scores(entity_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
+async def get_scores(entity_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("scores", entity_id, fields)
+
 
-        url = f"{base_url}/entities/{entity_id}/insights/metrics/scores"
-        headers = {"X-API-Key": api_key,"accept-language": "es"}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-    
 @router.get("/cash-flow/{business_id}")
-async def get_cash_flow(business_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
-        url = f"{base_url}/insights/{business_id}/cash-flow"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+async def get_cash_flow(business_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("cash-flow", business_id, fields)
+
 
 @router.get("/summary/{entity_id}")
-async def get_summary(entity_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
+async def get_summary(entity_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("summary", entity_id, fields)
 
-        url = f"{base_url}/insights/{entity_id}/summary"
-        headers = {"X-API-Key": api_key,"accept-language": "es"}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-   
 
 @router.get("/extractions")
-async def get_extractions():
+async def get_extractions(fields: Optional[str] = FIELDS_QUERY):
+    _validate_fields(fields)
     try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-
+        api_key = _api_key()
         url = f"{base_url}/entities"
         headers = {"X-API-Key": api_key,"accept-language": "es"}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
+        return project(await _fetch_cached(url, headers), fields)
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
-    
+
+
 @router.get("/buro-de-credito/reports/{entity_id}")
-async def get_buro_de_credito_reports(entity_id: str):
-    try:
-        api_key = os.getenv("SYNTAGE_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        url = f"{base_url}/entities/{entity_id}/datasources/mx/buro-de-credito/reports"
-        headers = {"X-API-Key": api_key}
-        
-        # Verificar cache
-        cached_data = cache.get(url)
-        if cached_data is not None:
-            return cached_data
-        
+async def get_buro_de_credito_reports(entity_id: str, fields: Optional[str] = FIELDS_QUERY):
+    return await _proxy_insight("buro-de-credito", entity_id, fields)
+
+
+@router.get("/entities/{entity_id}/bundle")
+async def get_entity_bundle(
+    entity_id: str,
+    include: Optional[str] = Query(
+        None,
+        description="Insights separados por coma (p. ej. summary,scores,risks). Por defecto todos.",
+    ),
+    business_id: Optional[str] = Query(
+        None,
+        description="RFC para los insights por negocio; por defecto se usa el entity_id.",
+    ),
+):
+    """
+    Resuelve varios insights de una entidad en una sola petición.
+    Las consultas se hacen en paralelo a través del cache y cada sección
+    falla por separado: los errores se reportan en "errors" sin afectar al resto.
+    Como mucho se piden los insights del catálogo (sin duplicados), y las
+    consultas a Syntage usan el sublímite SYNTAGE_BATCH_MAX_CONCURRENCY.
+    """
+    names = _parse_insight_names(include.split(",")) if include else list(INSIGHTS)
+
+    async with httpx.AsyncClient() as client:
+        results = await asyncio.gather(
+            *(fetch_insight(name, _resource_id(name, entity_id, business_id), client, batch=True)
+              for name in names),
+            return_exceptions=True,
+        )
+
+    sections: Dict[str, Any] = {}
+    errors: Dict[str, Any] = {}
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            errors[name] = _error_detail(result)
+        else:
+            sections[name] = result
+
+    return {"entity_id": entity_id, "sections": sections, "errors": errors}
+
+
+class BatchEntity(BaseModel):
+    entity_id: str
+    business_id: Optional[str] = Field(None, description="RFC para los insights por negocio")
+
+
+class BatchInsightsRequest(BaseModel):
+    entities: List[BatchEntity] = Field(..., min_length=1)
+    insights: List[str] = Field(..., min_length=1, examples=[["summary", "scores", "risks"]])
+
+
+@router.post("/insights/batch")
+async def post_insights_batch(request_data: BatchInsightsRequest):
+    """
+    Obtiene los mismos insights para muchas entidades.
+    Devuelve NDJSON: una línea por (entidad, insight) en cuanto se resuelve,
+    sin orden garantizado. Se aceptan como mucho SYNTAGE_BATCH_MAX_ITEMS
+    consultas (entidades x insights; si no, 413), y las consultas a Syntage
+    usan el sublímite SYNTAGE_BATCH_MAX_CONCURRENCY del límite global
+    SYNTAGE_MAX_CONCURRENCY, para no acaparar los lugares de las rutas de un
+    solo insight.
+    """
+    names = _parse_insight_names(request_data.insights)
+    entities = request_data.entities
+    if len(entities) * len(names) > max_batch_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many insights: {len(entities)} entities x {len(names)} insights "
+                   f"exceeds {max_batch_items} (SYNTAGE_BATCH_MAX_ITEMS)",
+        )
+
+    async def fetch_one(client: httpx.AsyncClient, entity: BatchEntity, name: str) -> Dict[str, Any]:
+        line: Dict[str, Any] = {"entity_id": entity.entity_id, "insight": name}
+        try:
+            line["data"] = await fetch_insight(
+                name, _resource_id(name, entity.entity_id, entity.business_id), client, batch=True
+            )
+        except HTTPException as e:
+            line["error"] = _error_detail(e)
+        return line
+
+    async def stream_results():
         async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            # Cachear la respuesta
-            cache.set(url, data)
-            return data
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"Error from external API: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {e}")
+            tasks = [
+                asyncio.ensure_future(fetch_one(client, entity, name))
+                for entity in entities
+                for name in names
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    line = await next_done
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+            finally:
+                # Si el cliente se desconecta, no seguir consultando upstream
+                for task in tasks:
+                    task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -7,7 +8,16 @@ from middlewares.authMiddleware import validate_access_token
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # No dejar procesos del mapping por lote vivos al apagar o recargar
+    financial_mapping_controller.shutdown_mapping_pool()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     dependencies=[Depends(validate_access_token)] #asegura que siempre se valide el token de acceso
 )
 
@@ -10,23 +10,44 @@ Este módulo provee la dependencia `validate_access_token` para proteger rutas e
    - Verificación manual de firma RS256 contra certificados X.509 de Firebase.
    - Reclamos verificados: `exp`, `aud`, `iss`, `sub`.
 
-### Caching de certificados X.509
-Los certificados públicos de Firebase se almacenan en memoria (`_certs`) junto con su tiempo de expiración (`_certs_expiry`) según `Cache-Control: max-age`. Se usan con un lock para seguridad ante múltiples hilos; al expirar se redescargan.
+### Claves públicas de Firebase
+`FirebaseKeyManager` descarga los certificados X.509 de Firebase y los convierte una sola vez
+por descarga en objetos de clave pública listos para PyJWT. Un hilo en segundo plano los renueva
+antes de que venza `Cache-Control: max-age`; si la renovación falla se siguen usando las claves
+anteriores y se reintenta. La descarga nunca ocurre mientras se sostiene el lock de lectura.
+La URL se configura con `FIREBASE_CERT_URL` (útil para un servidor local en pruebas).
+Con `FIREBASE_AUTH_STANDIN=true` se usan los certificados de `middlewares/firebaseStandIn.py`;
+solo se permite junto con `DEVELOP=true` (si no, la app no arranca).
+
+### Caché de tokens verificados
+Los tokens ya verificados se guardan en memoria (`_verified_tokens`) con clave SHA-256 del token
+y expiran en su reclamo `exp`. Las peticiones repetidas con el mismo token evitan la verificación
+RS256. El tamaño máximo se configura con `AUTH_TOKEN_CACHE_SIZE` (LRU, 10000 por defecto).
+
+### Límites por usuario
+Tras verificar el token se aplican los límites de `middlewares/rateLimiter.py` por `sub`
+(token bucket y peticiones concurrentes). Al excederlos → `HTTPException 429` con `Retry-After`.
 
 ### Comportamiento de errores
 - Falta o formato incorrecto de la cabecera → `HTTPException 401 Unauthorized`
+- Token inválido → `HTTPException 403 Forbidden`
+- Límite por usuario excedido → `HTTPException 429 Too Many Requests`
 """
 
 import os
+import math
 import time
+import hashlib
 import threading
+from collections import OrderedDict
 import requests
 from fastapi import Header, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from .rateLimiter import RateLimiter
 from dotenv import load_dotenv
 import jwt
 from jwt import ExpiredSignatureError, InvalidAudienceError, InvalidIssuerError, InvalidSignatureError
 from cryptography import x509
-from cryptography.hazmat.primitives import serialization
 
 # Cargar variables de entorno
 load_dotenv('.env')
@@ -41,53 +62,121 @@ if not PROJECT_ID:
     )
 
 # URL de certificados públicos de Firebase
-_CERT_URL = (
+_CERT_URL = os.getenv(
+    "FIREBASE_CERT_URL",
     "https://www.googleapis.com/robot/v1/metadata/x509/"
-    "securetoken@system.gserviceaccount.com"
+    "securetoken@system.gserviceaccount.com",
 )
 
-# Caché de certificados
-_certs = None
-_certs_expiry = 0
-_certs_lock = threading.Lock()
+# Modo de pruebas: certificados servidos localmente por firebaseStandIn.
+# Solo en desarrollo (DEVELOP=true): en producción aceptaría tokens de cualquiera
+# con la clave local
+if os.getenv("FIREBASE_AUTH_STANDIN") == "true":
+    if os.getenv("DEVELOP") != "true":
+        raise ValueError(
+            "FIREBASE_AUTH_STANDIN=true solo se permite en desarrollo. Define también 'DEVELOP=true'."
+        )
+    from . import firebaseStandIn
+    _CERT_URL = firebaseStandIn.serve_certs()
+    print(f"⚠️ FIREBASE_AUTH_STANDIN activo: se aceptan tokens firmados localmente ({_CERT_URL}). No usar en producción.")
+
+def _parse_max_age(cache_control: str) -> int:
+    """Extrae max-age (segundos) de una cabecera Cache-Control"""
+    max_age = 0
+    for part in cache_control.split(','):
+        if part.strip().startswith('max-age'):
+            _, val = part.split('=', 1)
+            try:
+                max_age = int(val)
+            except ValueError:
+                pass
+    return max_age
 
-def _get_firebase_certs():
+class FirebaseKeyManager:
     """
-    Descarga y cachea los certificados X.509 de Firebase.
-    Retorna dict { kid: cert_pem } protegido por lock.
-    Imprime si se usa caché o se realiza petición.
+    Mantiene las claves públicas de Firebase ya parseadas ({kid: clave}).
+    - La primera carga es síncrona; después se renuevan en segundo plano
+      al consumir `refresh_fraction` del max-age.
+    - Si una renovación falla se conservan las claves previas y se reintenta
+      cada `retry_interval` segundos.
+    - Un `kid` desconocido fuerza una renovación (a lo sumo una cada
+      `min_refresh_interval` segundos) por si Google rotó las claves.
     """
-    global _certs, _certs_expiry
-    with _certs_lock:
-        if _certs and time.time() < _certs_expiry:
-            print(f"🔄 Usando certificados cacheados hasta {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(_certs_expiry))}")
-            return _certs
-
-        print("🌐 Caché expirado o no existente; descargando certificados...")
-        resp = requests.get(_CERT_URL)
+
+    def __init__(self, cert_url: str, refresh_fraction: float = 0.8,
+                 retry_interval: float = 30, min_refresh_interval: float = 60):
+        self.cert_url = cert_url
+        self.refresh_fraction = refresh_fraction
+        self.retry_interval = retry_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._expiry = 0.0
+        self._last_refresh = 0.0
+        self._refresh_lock = threading.Lock()
+        self._timer = None
+
+    def _download(self):
+        resp = requests.get(self.cert_url, timeout=10)
         resp.raise_for_status()
+        max_age = _parse_max_age(resp.headers.get("Cache-Control", ""))
+        keys = {
+            kid: x509.load_pem_x509_certificate(cert_pem.encode('utf-8')).public_key()
+            for kid, cert_pem in resp.json().items()
+        }
+        return keys, max_age
+
+    def _schedule(self, delay: float):
+        timer = threading.Timer(delay, self.refresh)
+        timer.daemon = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = timer
+        timer.start()
+
+    def _refresh_locked(self) -> bool:
+        self._last_refresh = time.time()
+        try:
+            keys, max_age = self._download()
+        except Exception as e:
+            print(f"⚠️ No se pudieron renovar los certificados de Firebase: {e}")
+            self._schedule(self.retry_interval)
+            return False
+
+        # Reemplazo atómico: los lectores ven el dict anterior o el nuevo
+        self._keys = keys
+        self._expiry = self._last_refresh + max_age
+        self._schedule(max(max_age * self.refresh_fraction, self.retry_interval))
+        print(f"✅ Certificados actualizados; expiran en {max_age}s hasta {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._expiry))}")
+        return True
+
+    def refresh(self) -> bool:
+        """Descarga y reemplaza las claves; retorna False si falló (se conservan las previas)"""
+        with self._refresh_lock:
+            return self._refresh_locked()
+
+    def get_key(self, kid: str):
+        """Retorna la clave pública para `kid` o None si no existe"""
+        keys = self._keys
+        if kid in keys:
+            return keys[kid]
+
+        # Sin claves o kid desconocido: renovar una sola vez aunque lleguen varios hilos.
+        # Si no hay claves se reintenta como máximo una vez por segundo.
+        with self._refresh_lock:
+            keys = self._keys
+            min_interval = self.min_refresh_interval if keys else 1
+            if kid not in keys and time.time() - self._last_refresh >= min_interval:
+                self._refresh_locked()
+                keys = self._keys
+        return keys.get(kid)
 
-        cache_control = resp.headers.get("Cache-Control", "")
-        max_age = 0
-        for part in cache_control.split(','):
-            if part.strip().startswith('max-age'):
-                _, val = part.split('=', 1)
-                try:
-                    max_age = int(val)
-                except ValueError:
-                    pass
-
-        _certs = resp.json()
-        _certs_expiry = time.time() + max_age
-        print(f"✅ Certificados actualizados; expiran en {max_age}s hasta {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(_certs_expiry))}")
-        return _certs
+_key_manager = FirebaseKeyManager(_CERT_URL)
 
 def _verify_firebase_jwt(id_token: str) -> dict:
     """
     Verifica manualmente un Firebase ID Token:
       - Obtiene 'kid' del header JWT.
-      - Carga certificado del caché.
-      - Convierte X.509 a clave pública PEM.
+      - Obtiene la clave pública ya parseada del FirebaseKeyManager.
       - Decodifica y valida reclamos con PyJWT.
     Retorna payload o lanza ValueError.
     """
@@ -102,18 +191,10 @@ def _verify_firebase_jwt(id_token: str) -> dict:
     if alg != 'RS256' or not kid:
         raise ValueError('Encabezado JWT inválido')
 
-    certs = _get_firebase_certs()
-    cert_pem = certs.get(kid)
-    if not cert_pem:
+    public_key = _key_manager.get_key(kid)
+    if public_key is None:
         raise ValueError(f'Clave pública desconocida: {kid}')
 
-    # Parsear certificado X.509 a clave pública PEM
-    cert_obj = x509.load_pem_x509_certificate(cert_pem.encode('utf-8'))
-    public_key = cert_obj.public_key().public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo,
-    )
-
     try:
         payload = jwt.decode(
             id_token,
@@ -137,11 +218,50 @@ def _verify_firebase_jwt(id_token: str) -> dict:
         raise ValueError("Claim 'sub' inválido en JWT")
     return payload
 
-def validate_access_token(authorization: str = Header(None)):
+# Caché de tokens verificados: sha256(token) -> (payload, exp)
+_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+_verified_tokens = OrderedDict()
+_verified_tokens_lock = threading.Lock()
+
+def _token_key(id_token: str) -> bytes:
+    return hashlib.sha256(id_token.encode('utf-8')).digest()
+
+def _get_cached_payload(key: bytes):
+    """Retorna el payload si el token ya fue verificado y no ha expirado"""
+    with _verified_tokens_lock:
+        entry = _verified_tokens.get(key)
+        if entry is None:
+            return None
+        payload, exp = entry
+        if time.time() >= exp:
+            del _verified_tokens[key]
+            return None
+        _verified_tokens.move_to_end(key)
+        return payload
+
+def _cache_payload(key: bytes, payload: dict):
+    """Guarda un payload verificado hasta su 'exp', desalojando el menos usado"""
+    exp = payload.get('exp')
+    if not isinstance(exp, (int, float)) or _TOKEN_CACHE_SIZE <= 0:
+        return
+    with _verified_tokens_lock:
+        _verified_tokens[key] = (payload, exp)
+        _verified_tokens.move_to_end(key)
+        while len(_verified_tokens) > _TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+
+# Límites por usuario (sub)
+rate_limiter = RateLimiter.from_env()
+
+async def validate_access_token(authorization: str = Header(None)):
     """
-    Dependencia de FastAPI:
+    Dependencia de FastAPI (asíncrona, no ocupa el threadpool):
     1) Verificar Firebase ID Token.
-    Sino → HTTPException 401/403.
+       - Token en caché → se resuelve en el event loop, sin trabajo RSA.
+       - Token nuevo → la verificación RS256 (y la descarga inicial de
+         certificados, si hiciera falta) se ejecuta en el threadpool.
+    2) Aplicar los límites por usuario (sub) mientras dura la petición.
+    Sino → HTTPException 401/403/429.
     """
     if not authorization:
         raise HTTPException(
@@ -161,13 +281,29 @@ def validate_access_token(authorization: str = Header(None)):
     token = parts[1]
 
     # 2) Verificar Firebase JWT
-    try:
-        payload = _verify_firebase_jwt(token)
-    except ValueError:
+    cache_key = _token_key(token)
+    payload = _get_cached_payload(cache_key)
+    if payload is None:
+        try:
+            payload = await run_in_threadpool(_verify_firebase_jwt, token)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this resource",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        _cache_payload(cache_key, payload)
+
+    # 3) Límites por usuario
+    sub = payload['sub']
+    retry_after = rate_limiter.acquire(sub)
+    if retry_after is not None:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this resource",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
         )
-
-    return
\ No newline at end of file
+    try:
+        yield payload
+    finally:
+        rate_limiter.release(sub)
@@ -0,0 +1,205 @@
+"""
+Módulo: firebaseStandIn
+
+Sustituto local de Firebase Authentication para desarrollo, CI sin red y
+pruebas de carga. Permite ejercitar `validate_access_token` completo
+(cabecera, `kid`, firma RS256, `aud`, `iss`, `exp`, `sub`) sin googleapis.com.
+
+- Una clave RSA local y su certificado X.509 autofirmado se generan la primera
+  vez en `FIREBASE_STANDIN_DIR` (por defecto `.firebase-standin/`) y se reutilizan,
+  así el servidor de certificados y el emisor de tokens comparten la misma clave
+  aunque corran en procesos distintos.
+- `serve_certs()` expone `{kid: cert_pem}` igual que el endpoint de Google.
+- `mint_token()` emite ID Tokens con `aud`/`iss` del proyecto configurado.
+
+Con `FIREBASE_AUTH_STANDIN=true`, `authMiddleware` levanta el servidor de
+certificados en el propio proceso y lo usa como `FIREBASE_CERT_URL`; exige
+además `DEVELOP=true`. NUNCA activar en producción: cualquiera con la clave
+local puede emitir tokens. `.firebase-standin/` está en `.gitignore` y en
+`.dockerignore` para que la clave no llegue al repositorio ni a la imagen.
+
+Uso por línea de comandos:
+    python -m middlewares.firebaseStandIn mint --sub usuario-1 --ttl 3600
+    python -m middlewares.firebaseStandIn serve --port 9099
+"""
+
+import argparse
+import datetime
+import hashlib
+import http.server
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+STANDIN_DIR = os.getenv("FIREBASE_STANDIN_DIR", ".firebase-standin")
+_KEY_FILE = "key.pem"
+_CERT_FILE = "cert.pem"
+
+_material = None
+_material_lock = threading.Lock()
+_server = None
+
+
+def _generate() -> Tuple[bytes, bytes]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "firebase-standin")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=3650))
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    return key_pem, cert.public_bytes(serialization.Encoding.PEM)
+
+
+def _read_when_ready(path: str, timeout: float = 10) -> bytes:
+    """Lee un archivo que otro proceso puede estar terminando de escribir"""
+    deadline = time.time() + timeout
+    while True:
+        with open(path, "rb") as f:
+            data = f.read()
+        if data.rstrip().endswith(b"-----") or time.time() > deadline:
+            return data
+        time.sleep(0.05)
+
+
+def _load_or_create(directory: str) -> Tuple[bytes, bytes]:
+    """
+    Carga la clave y el certificado del directorio o los crea.
+    El primer proceso que crea key.pem (O_EXCL) gana; el resto lo lee.
+    """
+    os.makedirs(directory, exist_ok=True)
+    key_path = os.path.join(directory, _KEY_FILE)
+    cert_path = os.path.join(directory, _CERT_FILE)
+    try:
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # El certificado se escribe antes que la clave, así que ya existe
+        key_pem = _read_when_ready(key_path)
+        return key_pem, _read_when_ready(cert_path)
+
+    key_pem, cert_pem = _generate()
+    tmp_cert = cert_path + f".{os.getpid()}.tmp"
+    with open(tmp_cert, "wb") as f:
+        f.write(cert_pem)
+    os.replace(tmp_cert, cert_path)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key_pem)
+    return key_pem, cert_pem
+
+
+def _get_material() -> Dict[str, Any]:
+    global _material
+    with _material_lock:
+        if _material is None:
+            key_pem, cert_pem = _load_or_create(STANDIN_DIR)
+            _material = {
+                "key": serialization.load_pem_private_key(key_pem, password=None),
+                "cert_pem": cert_pem.decode("utf-8"),
+                "kid": hashlib.sha1(cert_pem).hexdigest(),
+            }
+        return _material
+
+
+def certs_document() -> Dict[str, str]:
+    """Documento {kid: cert_pem} con el formato del endpoint de Google"""
+    material = _get_material()
+    return {material["kid"]: material["cert_pem"]}
+
+
+def mint_token(sub: str, project_id: Optional[str] = None, ttl: int = 3600,
+               extra_claims: Optional[Dict[str, Any]] = None) -> str:
+    """Emite un ID Token RS256 con los reclamos que valida authMiddleware"""
+    project_id = project_id or os.getenv("FIREBASE_PROJECT_ID")
+    if not project_id:
+        raise ValueError("Define FIREBASE_PROJECT_ID o pasa project_id para emitir tokens.")
+    material = _get_material()
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{project_id}",
+        "aud": project_id,
+        "auth_time": now,
+        "user_id": sub,
+        "sub": sub,
+        "iat": now,
+        "exp": now + ttl,
+        **(extra_claims or {}),
+    }
+    return jwt.encode(claims, material["key"], algorithm="RS256", headers={"kid": material["kid"]})
+
+
+def serve_certs(host: str = "127.0.0.1", port: int = 0, max_age: int = 3600) -> str:
+    """
+    Sirve los certificados en un hilo daemon y retorna la URL.
+    Con port=0 se elige un puerto libre. Llamadas repetidas reutilizan el servidor.
+    """
+    global _server
+    if _server is not None:
+        return f"http://{_server.server_address[0]}:{_server.server_address[1]}/"
+
+    body = json.dumps(certs_document()).encode("utf-8")
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Cache-Control", f"public, max-age={max_age}")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return f"http://{_server.server_address[0]}:{_server.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sustituto local de Firebase Auth")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    mint = commands.add_parser("mint", help="Emitir un ID Token")
+    mint.add_argument("--sub", default="standin-user")
+    mint.add_argument("--ttl", type=int, default=3600)
+    mint.add_argument("--project-id", default=None)
+
+    serve = commands.add_parser("serve", help="Servir los certificados X.509")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9099)
+
+    args = parser.parse_args()
+    if args.command == "mint":
+        print(mint_token(args.sub, args.project_id, args.ttl))
+        return
+
+    url = serve_certs(args.host, args.port)
+    print(f"🔑 Certificados del sustituto de Firebase en {url}")
+    print(f"   Exporta FIREBASE_CERT_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Módulo: rateLimiter
+
+Límites por usuario (reclamo `sub` del Firebase ID Token) aplicados por
+`validate_access_token` justo después de verificar el token.
+
+- **Token bucket**: `RATE_LIMIT_PER_SECOND` peticiones por segundo con ráfagas de
+  hasta `RATE_LIMIT_BURST`. 0 desactiva el límite de tasa.
+- **Concurrencia**: como máximo `RATE_LIMIT_MAX_CONCURRENT` peticiones en curso por
+  usuario (32 por defecto: el frontend abre hasta 18 peticiones en paralelo para
+  un perfil). 0 desactiva el límite.
+- Al exceder cualquiera de los dos → `HTTPException 429` con cabecera `Retry-After`.
+
+Cada operación es O(1). Los usuarios inactivos por más de `idle_ttl` segundos se
+desalojan de forma incremental (los menos recientes primero, revisando como mucho
+`_EVICT_SCAN` usuarios por petición), y se guardan como máximo `max_entries`
+usuarios; un usuario con peticiones en curso nunca se desaloja (se pasa al final
+y se sigue revisando), así que el límite puede excederse temporalmente. Los
+límites son por proceso (por worker de Uvicorn).
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Usuarios revisados como máximo por llamada a _evict_idle
+_EVICT_SCAN = 8
+
+
+class _UserBudget:
+    __slots__ = ("tokens", "updated", "in_flight")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.in_flight = 0
+
+
+class RateLimiter:
+    """
+    Token bucket + límite de concurrencia por usuario.
+    Está pensado para usarse desde el event loop (sin locks).
+    """
+
+    def __init__(self, rate: float, burst: float, max_concurrent: int,
+                 idle_ttl: float = 600, max_entries: int = 100_000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_concurrent = max_concurrent
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._users = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            rate=float(os.getenv("RATE_LIMIT_PER_SECOND", "10")),
+            burst=float(os.getenv("RATE_LIMIT_BURST", "40")),
+            max_concurrent=int(os.getenv("RATE_LIMIT_MAX_CONCURRENT", "32")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 or self.max_concurrent > 0
+
+    def _evict_idle(self, now: float):
+        # Se revisa el frente: el usuario con el acceso más antiguo. Uno con
+        # peticiones en curso (p. ej. un lote largo) no se desaloja, porque su
+        # release() debe encontrar su presupuesto, pero tampoco debe frenar el
+        # desalojo de los inactivos detrás de él: se pasa al final.
+        for _ in range(min(_EVICT_SCAN, len(self._users))):
+            sub, budget = next(iter(self._users.items()))
+            if budget.in_flight > 0:
+                self._users.move_to_end(sub)
+                continue
+            idle = now - budget.updated >= self.idle_ttl
+            if not idle and len(self._users) < self.max_entries:
+                return
+            self._users.popitem(last=False)
+
+    def acquire(self, sub: str) -> Optional[float]:
+        """
+        Reserva una petición para `sub`.
+        Retorna None si se permite, o los segundos sugeridos para Retry-After.
+        """
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        self._evict_idle(now)
+        budget = self._users.get(sub)
+        if budget is None:
+            budget = _UserBudget(self.burst, now)
+            self._users[sub] = budget
+        else:
+            self._users.move_to_end(sub)
+
+        if self.max_concurrent > 0 and budget.in_flight >= self.max_concurrent:
+            return 1.0
+
+        if self.rate > 0:
+            budget.tokens = min(self.burst, budget.tokens + (now - budget.updated) * self.rate)
+            budget.updated = now
+            if budget.tokens < 1:
+                return (1 - budget.tokens) / self.rate
+            budget.tokens -= 1
+        else:
+            budget.updated = now
+
+        budget.in_flight += 1
+        return None
+
+    def release(self, sub: str):
+        """Libera una petición reservada con acquire()"""
+        if not self.enabled:
+            return
+        budget = self._users.get(sub)
+        if budget is not None and budget.in_flight > 0:
+            budget.in_flight -= 1
+
+
+if __name__ == "__main__":
+    # Con idle_ttl=0 todo usuario sin peticiones en curso está inactivo
+    limiter = RateLimiter(rate=0, burst=1, max_concurrent=5, idle_ttl=0)
+    failures = []
+
+    limiter.acquire("lote")  # petición larga, sigue en curso
+    limiter.acquire("inactivo")
+    limiter.release("inactivo")
+    limiter.acquire("nuevo")
+    if "inactivo" in limiter._users:
+        failures.append("un usuario inactivo detrás de uno ocupado no se desalojó")
+    if "lote" not in limiter._users:
+        failures.append("se desalojó un usuario con peticiones en curso")
+
+    # Más usuarios ocupados al frente que _EVICT_SCAN: el inactivo sale en pocas llamadas
+    limiter = RateLimiter(rate=0, burst=1, max_concurrent=5, idle_ttl=0)
+    for i in range(3 * _EVICT_SCAN):
+        limiter.acquire(f"lote-{i}")
+    limiter.acquire("inactivo")
+    limiter.release("inactivo")
+    for i in range(4):
+        limiter.acquire(f"nuevo-{i}")
+        limiter.release(f"nuevo-{i}")
+    if "inactivo" in limiter._users:
+        failures.append(f"un inactivo detrás de {3 * _EVICT_SCAN} ocupados no se desalojó")
+    if any(f"lote-{i}" not in limiter._users for i in range(3 * _EVICT_SCAN)):
+        failures.append("se desalojó un usuario con peticiones en curso")
+
+    limiter.release("lote-0")
+    for i in range(4):
+        limiter.acquire(f"otro-{i}")
+    if "lote-0" in limiter._users:
+        failures.append("un usuario ocupado no se desalojó después de terminar sus peticiones")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("✅ Los usuarios inactivos se desalojan aunque haya usuarios ocupados delante")
@@ -0,0 +1,211 @@
+"""
+Decodificación tipada (msgspec) de solicitudes de map_to_evaluate_request.
+
+Los modelos Pydantic de controllers/financial_mapping_controller.py describen
+el reporte de Buró completo, pero validarlos en cada solicitud es caro. Aquí
+solo se declaran los campos que usa el mapping; msgspec los decodifica directo
+de los bytes, ignora el resto del reporte y convierte los montos (que Buró
+envía como texto) a float una sola vez, al decodificar. El resto de la
+solicitud (summaryData, financialRatiosData, ...) se decodifica como objetos
+de Python y pasa por las mismas funciones que la versión con dicts.
+
+Equivalencia con la versión con dicts:
+- Los montos se decodifican en modo no estricto; msgspec acepta un texto solo
+  si es un número JSON válido, con el mismo valor que float().
+- atrasoMayor se convierte con int(), igual que _safe_int ("15.0" -> 0).
+- Si algo no tiene el tipo esperado (p. ej. un monto "N/A" o una lista donde va
+  un objeto), decode_request lanza msgspec.ValidationError y quien llama usa la
+  versión con dicts, que da el mismo resultado o el mismo error.
+"""
+
+import json
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Union
+
+import msgspec
+
+from .financialCalcs import (
+    SECTIONS,
+    _CREDITO_APROBADO_FIELDS,
+    _SALDO_VENCIDO_FIELDS,
+    _aggregate_credit_history,
+    _default_credit_history,
+    _section_inputs,
+    map_sections,
+    map_to_evaluate_request,
+)
+
+
+class BuroCreditoFinanciero(msgspec.Struct):
+    atrasoMayor: Union[int, str, None] = None
+    historicoPagos: Optional[str] = None
+    # Cualquier valor "verdadero" indica un crédito cerrado
+    fechaCierre: Any = None
+    apertura: Optional[str] = None
+    claveObservacion: Optional[str] = None
+    saldoVencidoDe1a29Dias: Optional[float] = None
+    saldoVencidoDe30a59Dias: Optional[float] = None
+    saldoVencidoDe60a89Dias: Optional[float] = None
+    saldoVencidoDe90a119Dias: Optional[float] = None
+    saldoVencidoDe120a179Dias: Optional[float] = None
+    saldoVencidoDe180DiasOMas: Optional[float] = None
+    creditoMaximoUtilizado: Optional[float] = None
+    saldoInicial: Optional[float] = None
+
+    def __post_init__(self):
+        if isinstance(self.atrasoMayor, str):
+            try:
+                self.atrasoMayor = int(self.atrasoMayor)
+            except ValueError:
+                self.atrasoMayor = None
+
+
+class BuroCreditoComercial(msgspec.Struct):
+    saldoVencido: Optional[float] = None
+
+
+_saldos_vencidos = attrgetter(*_SALDO_VENCIDO_FIELDS)
+_creditos_aprobados = attrgetter(*_CREDITO_APROBADO_FIELDS)
+
+
+def _credit_fields(credito: BuroCreditoFinanciero) -> tuple:
+    """La tupla de financialCalcs._credit_fields, sin conversiones: ya se hicieron al decodificar"""
+    return (
+        credito.atrasoMayor or 0,
+        credito.historicoPagos,
+        credito.fechaCierre,
+        credito.apertura,
+        credito.claveObservacion,
+        _saldos_vencidos(credito),
+        _creditos_aprobados(credito),
+    )
+
+
+def _commercial_overdue(credito: BuroCreditoComercial) -> float:
+    return credito.saldoVencido or 0.0
+
+
+class BuroData(msgspec.Struct):
+    creditoFinanciero: Optional[List[BuroCreditoFinanciero]] = None
+    creditoComercial: Optional[List[BuroCreditoComercial]] = None
+
+
+class BuroMember(msgspec.Struct):
+    data: Optional[BuroData] = None
+
+
+class BuroReportData(msgspec.Struct):
+    Buro: Optional[List[BuroMember]] = None
+
+
+class EvaluateRequestData(msgspec.Struct):
+    """Solicitud de /map-to-evaluate-request; UNSET si la llave no viene"""
+    summaryData: Any = msgspec.UNSET
+    financialRatiosData: Any = msgspec.UNSET
+    riskIndicatorsData: Any = msgspec.UNSET
+    annualComparisonData: Any = msgspec.UNSET
+    buroReportData: Optional[BuroReportData] = None
+
+
+_REQUEST_FIELDS = ("summaryData", "financialRatiosData", "riskIndicatorsData", "annualComparisonData")
+
+_decoder = msgspec.json.Decoder(EvaluateRequestData, strict=False)
+
+
+def decode_request(line: bytes) -> EvaluateRequestData:
+    """Decodifica una solicitud; lanza msgspec.DecodeError/ValidationError"""
+    return _decoder.decode(line)
+
+
+def _plain_data(request: EvaluateRequestData) -> Dict[str, Any]:
+    """Partes de la solicitud que no se tipan, como en la versión con dicts"""
+    return {
+        name: value for name in _REQUEST_FIELDS
+        if (value := getattr(request, name)) is not msgspec.UNSET
+    }
+
+
+def _typed_credit_history(request: EvaluateRequestData, now: Optional[datetime]) -> Dict[str, Any]:
+    ch_data = _default_credit_history()
+    report = request.buroReportData
+    buro_data = report.Buro[0].data if report is not None and report.Buro else None
+    if buro_data is not None:
+        fecha_limite = (now or datetime.now()) - timedelta(days=365)
+        ch_data.update(_aggregate_credit_history(
+            buro_data.creditoFinanciero or [], buro_data.creditoComercial or [], fecha_limite,
+            _credit_fields, _commercial_overdue,
+        ))
+    return ch_data
+
+
+def typed_section_inputs(request: EvaluateRequestData) -> Dict[str, Any]:
+    """
+    _section_inputs de una solicitud tipada. buro_report trae solo los campos
+    que usa el mapping, ya convertidos, así que su huella en
+    utils/evaluationCache.py no coincide con la de la misma solicitud en dicts.
+    """
+    inputs = _section_inputs(_plain_data(request))
+    report = request.buroReportData
+    inputs["buro_report"] = msgspec.to_builtins(report) if report is not None else {}
+    return inputs
+
+
+def map_typed_sections(request: EvaluateRequestData, sections=SECTIONS,
+                       now: Optional[datetime] = None) -> Dict[str, Any]:
+    """map_sections sobre una solicitud decodificada con decode_request"""
+    result = map_sections(_plain_data(request), tuple(s for s in sections if s != "ch"), now)
+    if "ch" in sections:
+        result["ch"] = _typed_credit_history(request, now)
+    return {section: result[section] for section in SECTIONS if section in result}
+
+
+def map_typed_request(request: EvaluateRequestData, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """map_to_evaluate_request sobre una solicitud decodificada con decode_request"""
+    return map_typed_sections(request, SECTIONS, now)
+
+
+class InvalidRequestError(ValueError):
+    """La línea no es una solicitud válida para map_to_evaluate_request"""
+
+
+def decode_evaluate_request(body: bytes) -> Union[EvaluateRequestData, Dict[str, Any]]:
+    """
+    Decodifica una solicitud JSON de map_to_evaluate_request: tipada
+    (decode_request) si encaja en el esquema y, si no (o si no es JSON válido),
+    con json.loads como dict, que da el mismo resultado o el mismo error.
+
+    Lanza InvalidRequestError si no es un objeto JSON con summaryData.
+    """
+    try:
+        request = decode_request(body)
+    except msgspec.MsgspecError:
+        pass
+    else:
+        if not request.summaryData:
+            raise InvalidRequestError("summaryData is required")
+        return request
+
+    try:
+        request_data = json.loads(body)
+    except ValueError as e:
+        raise InvalidRequestError(f"Invalid JSON: {e}")
+    if not isinstance(request_data, dict):
+        raise InvalidRequestError("Request body must be a JSON object")
+    if not request_data.get("summaryData"):
+        raise InvalidRequestError("summaryData is required")
+    return request_data
+
+
+def map_json_to_evaluate_request(line: bytes, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Decodifica una solicitud JSON (decode_evaluate_request) y la mapea.
+    Pensada para correr en un proceso aparte (ProcessPoolExecutor): recibe
+    bytes y retorna un dict, así que la decodificación también sale del event loop.
+
+    Lanza InvalidRequestError si la línea no es un objeto JSON con summaryData.
+    """
+    request = decode_evaluate_request(line)
+    if isinstance(request, EvaluateRequestData):
+        return map_typed_request(request, now)
+    return map_to_evaluate_request(request, now)
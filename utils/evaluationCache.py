@@ -0,0 +1,218 @@
+"""
+Cache de resultados de map_to_evaluate_request por contenido.
+
+La misma solicitud suele llegar varias veces (revisión, reenvío, auditoría).
+Cada sección del resultado tiene una huella: el SHA-256 del JSON canónico
+(llaves ordenadas, sin espacios: el orden de las llaves no importa) de sus
+entradas, con la versión del mapping:
+
+    fin  <- summaryData + financialRatiosData + annualComparisonData
+    ch   <- buroReportData + día de referencia
+    comp <- riskIndicatorsData
+    geo  <- summaryData
+
+Las métricas relativas al tiempo de ch solo dependen del día (y de si la hora
+es exactamente medianoche). Al cambiar MAPPING_VERSION ninguna huella anterior
+coincide.
+
+Dos niveles:
+- Resultado completo, por las cuatro huellas: la misma solicitud el mismo día
+  se responde sin recalcular. Serializar la solicitud en forma canónica cuesta
+  casi lo mismo que mapearla; por eso, si se tiene el cuerpo crudo de la
+  petición, primero se busca por el hash de esos bytes (un reenvío suele ser
+  idéntico byte a byte).
+- Por RFC (summaryData.rfc): las secciones de la última evaluación de ese RFC.
+  Si solo cambió el buró, se recalcula ch y se reutilizan fin, comp y geo.
+
+Ambos son LRU acotados en memoria. Cada acierto devuelve una copia, para que
+quien llama pueda modificar el resultado sin alterar el guardado.
+
+La solicitud puede venir como dict o decodificada con utils/buroSchema.py
+(EvaluateRequestData); en ese caso las secciones se calculan con la versión
+tipada. También puede pasarse una función que la decodifica: solo se llama si
+no hubo acierto por los bytes crudos.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, time
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Union
+
+from .buroSchema import EvaluateRequestData, map_typed_sections, typed_section_inputs
+from .financialCalcs import MAPPING_VERSION, SECTIONS, _section_inputs, map_sections
+
+# Solicitud en dict o tipada (ver el docstring del módulo)
+Request = Union[Dict[str, Any], EvaluateRequestData]
+
+
+def canonical_hash(data: Any) -> str:
+    """SHA-256 del JSON canónico (llaves ordenadas, separadores compactos)"""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _combine(*parts: str) -> str:
+    return hashlib.sha256(":".join(parts).encode("utf-8")).hexdigest()
+
+
+def _reference_key(now: datetime) -> str:
+    # El límite de 12 meses se compara contra fechas sin hora: a medianoche
+    # exacta una apertura de ese mismo día aún cuenta, a cualquier otra hora no
+    midnight = "T00" if now.time() == time.min else ""
+    return now.date().isoformat() + midnight
+
+
+def _inputs(data: Request) -> Dict[str, Any]:
+    if isinstance(data, EvaluateRequestData):
+        return typed_section_inputs(data)
+    return _section_inputs(data)
+
+
+def _map(data: Request, sections, now: datetime) -> Dict[str, Any]:
+    if isinstance(data, EvaluateRequestData):
+        return map_typed_sections(data, sections, now)
+    return map_sections(data, sections, now)
+
+
+def section_fingerprints(data: Request, now: datetime,
+                         inputs: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Huella de las entradas de cada sección (ver el docstring del módulo)"""
+    hashes = {name: canonical_hash(value) for name, value in (inputs or _inputs(data)).items()}
+    return {
+        "fin": _combine(MAPPING_VERSION, hashes["summary"], hashes["ratios"], hashes["annual"]),
+        "ch": _combine(MAPPING_VERSION, hashes["buro_report"], _reference_key(now)),
+        "comp": _combine(MAPPING_VERSION, hashes["risks"]),
+        "geo": _combine(MAPPING_VERSION, hashes["summary"]),
+    }
+
+
+def _copy(value: Any) -> Any:
+    """Copia de dicts y listas anidados (los valores del resultado son escalares)"""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _put(entries: OrderedDict, key: str, value: Any, max_entries: int):
+    entries[key] = value
+    entries.move_to_end(key)
+    while len(entries) > max_entries:
+        entries.popitem(last=False)
+
+
+class EvaluationCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # Llave de las cuatro huellas -> resultado completo
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Hash de los bytes crudos -> llave de las cuatro huellas
+        self.raw_keys: "OrderedDict[str, str]" = OrderedDict()
+        # RFC -> {sección: (huella, resultado)} de su última evaluación
+        self.sections: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.sections_reused = 0
+        self.sections_computed = 0
+        self.lock = Lock()
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+        return result
+
+    def evaluate(self, data: Union[Request, Callable[[], Request]], now: Optional[datetime] = None,
+                 raw: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Igual que map_to_evaluate_request(data, now), reutilizando resultados
+        guardados. `raw` es el cuerpo crudo del que viene `data`, si se tiene;
+        `data` puede ser una función que lo decodifica, y entonces solo se
+        llama si no hubo acierto por `raw`. Los errores no se guardan.
+        """
+        now = now or datetime.now()
+        if self.max_entries <= 0:
+            return _map(data() if callable(data) else data, SECTIONS, now)
+
+        raw_key = None
+        if raw is not None:
+            raw_key = f"{MAPPING_VERSION}:{_reference_key(now)}:{hashlib.sha256(raw).hexdigest()}"
+            with self.lock:
+                key = self.raw_keys.get(raw_key)
+                result = self._lookup(key) if key is not None else None
+                if result is not None:
+                    self.raw_keys.move_to_end(raw_key)
+                    self.hits += 1
+                    return _copy(result)
+
+        if callable(data):
+            data = data()
+        inputs = _inputs(data)
+        fingerprints = section_fingerprints(data, now, inputs)
+        key = _combine(*(fingerprints[section] for section in SECTIONS))
+        rfc = inputs["summary"].get('rfc')
+        if not isinstance(rfc, str):
+            rfc = None
+        with self.lock:
+            if raw_key is not None:
+                _put(self.raw_keys, raw_key, key, self.max_entries)
+            result = self._lookup(key)
+            if result is not None:
+                self.hits += 1
+                return _copy(result)
+            self.misses += 1
+            previous = self.sections.get(rfc, {}) if rfc else {}
+            reused = {
+                section: stored for section, (fingerprint, stored) in previous.items()
+                if fingerprints[section] == fingerprint
+            }
+
+        # Calcular fuera del lock solo las secciones cuyas entradas cambiaron
+        missing = tuple(section for section in SECTIONS if section not in reused)
+        computed = _map(data, missing, now) if missing else {}
+        result = {
+            section: computed[section] if section in computed else _copy(reused[section])
+            for section in SECTIONS
+        }
+
+        with self.lock:
+            self.sections_reused += len(reused)
+            self.sections_computed += len(computed)
+            _put(self.entries, key, _copy(result), self.max_entries)
+            if rfc:
+                stored = {section: (fingerprints[section], _copy(result[section])) for section in computed}
+                _put(self.sections, rfc, {**self.sections.get(rfc, {}), **stored}, self.max_entries)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "mapping_version": MAPPING_VERSION,
+                "entries": len(self.entries),
+                "rfcs": len(self.sections),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "sections_reused": self.sections_reused,
+                "sections_computed": self.sections_computed,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.raw_keys.clear()
+            self.sections.clear()
+            self.hits = 0
+            self.misses = 0
+            self.sections_reused = 0
+            self.sections_computed = 0
+
+
+# Instancia global; EVALUATION_CACHE_SIZE=0 lo desactiva
+evaluation_cache = EvaluationCache(int(os.getenv("EVALUATION_CACHE_SIZE", "1024")))
@@ -1,44 +1,78 @@
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Callable, Dict, Any, Optional, List
+from datetime import datetime, timedelta
+from functools import lru_cache
 
+from .scianIndex import scian_from_activities
+from .stateIndex import extract_state
 
-def map_to_evaluate_request(data: Dict[str, Any]) -> Dict[str, Any]:
+# Versión de las reglas del mapping: cambiarla al modificar cualquier cálculo
+# invalida los resultados guardados (ver utils/evaluationCache.py)
+MAPPING_VERSION = "3"
+
+
+def map_to_evaluate_request(data: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
     """
     Mapea datos financieros complejos a un formato estructurado para evaluación.
     
     Args:
         data: Diccionario con summaryData, financialRatiosData, 
               riskIndicatorsData, annualComparisonData y buroReportData
+        now: Fecha de referencia para las métricas relativas al tiempo
+             (p. ej. pct_open_12m). Por defecto datetime.now(); en evaluaciones
+             por lote conviene pasar la misma para todos los solicitantes.
     
     Returns:
         Diccionario con estructuras fin, ch, comp y geo
     """
     
-    # Extraer datos principales
-    summary = data.get('summaryData') or {}
-    ratios = data.get('financialRatiosData') or {}
-    risks = data.get('riskIndicatorsData', {}).get('data') or {}
-    annual = data.get('annualComparisonData', {}).get('items') or []
-    buro_report = data.get('buroReportData') or {}
+    return map_sections(data, SECTIONS, now)
+
+
+# Secciones del resultado, en orden
+SECTIONS = ("fin", "ch", "comp", "geo")
+
+
+def _section_inputs(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extrae los datos principales de la solicitud (entradas de las secciones)"""
+    return {
+        "summary": data.get('summaryData') or {},
+        "ratios": data.get('financialRatiosData') or {},
+        "risks": data.get('riskIndicatorsData', {}).get('data') or {},
+        "annual": data.get('annualComparisonData', {}).get('items') or [],
+        "buro_report": data.get('buroReportData') or {},
+    }
+
+
+def map_sections(data: Dict[str, Any], sections=SECTIONS,
+                 now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Calcula solo las secciones pedidas (fin, ch, comp y/o geo) de una solicitud.
+    Cada sección depende solo de sus entradas:
+        fin  <- summaryData, financialRatiosData, annualComparisonData
+        ch   <- buroReportData (y la fecha de referencia)
+        comp <- riskIndicatorsData
+        geo  <- summaryData
+    """
+    inputs = _section_inputs(data)
+    result = {}
     
     # ===== FIN - Datos Financieros =====
-    fin_data = _map_financial_data(summary, ratios, annual)
+    if "fin" in sections:
+        result["fin"] = _map_financial_data(inputs["summary"], inputs["ratios"], inputs["annual"])
     
     # ===== CH - Historial Crediticio =====
-    ch_data = _map_credit_history_data(buro_report)
+    if "ch" in sections:
+        result["ch"] = _map_credit_history_data(inputs["buro_report"], now)
     
     # ===== COMP - Cumplimiento =====
-    comp_data = _map_compliance_data(risks)
+    if "comp" in sections:
+        result["comp"] = _map_compliance_data(inputs["risks"])
     
     # ===== GEO - Datos Geográficos =====
-    geo_data = _map_geographic_data(summary)
+    if "geo" in sections:
+        result["geo"] = _map_geographic_data(inputs["summary"])
     
-    return {
-        "fin": fin_data,
-        "ch": ch_data,
-        "comp": comp_data,
-        "geo": geo_data
-    }
+    return result
 
 
 def _map_financial_data(summary: Dict, ratios: Dict, annual: List) -> Dict[str, Any]:
@@ -89,26 +123,37 @@ def _map_financial_data(summary: Dict, ratios: Dict, annual: List) -> Dict[str,
     }
 
 
-def _map_credit_history_data(buro_report: Dict) -> Dict[str, Any]:
+def _default_credit_history() -> Dict[str, Any]:
+    """Valores de ch cuando no hay datos de buró"""
+    return {
+        "dias_atraso": 0,
+        "num_open_performing_loan": 0,
+        "saldo_vencido_maxic_udis": 0.0,
+        "creditos_abiertos": 0,
+        "pct_open_12m": 0.0,
+        "claves_observacion": [],
+        "maximo_credito_aprobado_historico": 0.0,
+        "peor_atraso_6m": 0,
+        "peor_atraso_12m": 0,
+        "peor_atraso_24m": 0,
+        "meses_con_atraso": 0,
+        "racha_atraso_actual": 0
+    }
+
+
+def _map_credit_history_data(buro_report: Dict, now: Optional[datetime] = None) -> Dict[str, Any]:
     """
     Mapea datos del historial crediticio desde el reporte de buró (ch)
     
     Args:
         buro_report: Diccionario con la estructura BuroReportData
+        now: Fecha de referencia; por defecto datetime.now()
     
     Returns:
         Diccionario con métricas de historial crediticio
     """
     # Inicializar valores por defecto
-    ch_data = {
-        "dias_atraso": 0,
-        "num_open_performing_loan": 0,
-        "saldo_vencido_maxic_udis": 0.0,
-        "creditos_abiertos": 0,
-        "pct_open_12m": 0.0,
-        "claves_observacion": [],
-        "maximo_credito_aprobado_historico": 0.0
-    }
+    ch_data = _default_credit_history()
     
     # Si no hay datos de buró, retornar valores por defecto
     if not buro_report or not buro_report.get('Buro'):
@@ -127,34 +172,11 @@ def _map_credit_history_data(buro_report: Dict) -> Dict[str, Any]:
     creditos_financieros = buro_data.get('creditoFinanciero', []) or []
     creditos_comerciales = buro_data.get('creditoComercial', []) or []
     
-    # Calcular días de atraso máximo
-    dias_atraso = _calculate_max_days_overdue(creditos_financieros)
-    ch_data['dias_atraso'] = dias_atraso
-    
-    # Contar créditos abiertos con buen desempeño (performing loans)
-    num_performing = _count_open_performing_loans(creditos_financieros)
-    ch_data['num_open_performing_loan'] = num_performing
-    
-    # Calcular saldo vencido máximo
-    saldo_vencido = _calculate_max_overdue_balance(creditos_financieros, creditos_comerciales)
-    ch_data['saldo_vencido_maxic_udis'] = saldo_vencido
-    
-    # Contar créditos abiertos totales
-    creditos_abiertos = _count_open_credits(creditos_financieros)
-    ch_data['creditos_abiertos'] = creditos_abiertos
-    
-    # Calcular porcentaje de créditos abiertos en últimos 12 meses
-    pct_open_12m = _calculate_pct_open_12m(creditos_financieros)
-    ch_data['pct_open_12m'] = pct_open_12m
-    
-    # Extraer claves de observación
-    claves_observacion = _extract_observation_keys(creditos_financieros)
-    ch_data['claves_observacion'] = claves_observacion
-    
-    # Calcular máximo crédito aprobado histórico
-    maximo_credito = _calculate_max_approved_credit(creditos_financieros)
-    ch_data['maximo_credito_aprobado_historico'] = maximo_credito
-    
+    # Calcular todas las métricas en una sola pasada por los créditos
+    fecha_limite = (now or datetime.now()) - timedelta(days=365)
+    ch_data.update(
+        _aggregate_credit_history(creditos_financieros, creditos_comerciales, fecha_limite)
+    )
     return ch_data
 
 
@@ -205,15 +227,11 @@ def _map_geographic_data(summary: Dict) -> Dict[str, Any]:
     # Presencia física (asumimos true si hay dirección)
     presencia_fisica = bool(fiscal_address)
     
-    # Código SCIAN (del primer activity económico)
+    # Código SCIAN de las actividades económicas, ponderadas por porcentaje
     activities = summary.get('economicActivities', [])
     scian = None
     if activities and len(activities) > 0:
-        # Extraer código SCIAN si está en el nombre
-        activity_name = activities[0].get('name', '')
-        # En este caso, necesitaríamos un mapeo real de actividades a SCIAN
-        # Por ahora, generamos un código basado en la actividad principal
-        scian = _get_scian_from_activity(activities[0])
+        scian = _get_scian_from_activities(activities)
     
     return {
         "estado": estado,
@@ -282,57 +300,20 @@ def _calculate_sales_growth(annual: List[Dict]) -> bool:
 
 
 def _extract_state_from_address(address: str) -> str:
-    """Extrae el estado de una dirección fiscal"""
-    if not address:
-        return ""
-    
-    # Diccionario de estados comunes en México
-    estados_mexico = [
-        "AGUASCALIENTES", "BAJA CALIFORNIA", "BAJA CALIFORNIA SUR",
-        "CAMPECHE", "CHIAPAS", "CHIHUAHUA", "COAHUILA", "COLIMA",
-        "DURANGO", "GUANAJUATO", "GUERRERO", "HIDALGO", "JALISCO",
-        "MEXICO", "MICHOACAN", "MORELOS", "NAYARIT", "NUEVO LEON",
-        "OAXACA", "PUEBLA", "QUERETARO", "QUINTANA ROO", "SAN LUIS POTOSI",
-        "SINALOA", "SONORA", "TABASCO", "TAMAULIPAS", "TLAXCALA",
-        "VERACRUZ", "YUCATAN", "ZACATECAS", "CDMX", "CIUDAD DE MEXICO"
-    ]
-    
-    address_upper = address.upper()
-    
-    # Buscar estado en la dirección
-    for estado in estados_mexico:
-        if estado in address_upper:
-            if estado == "CIUDAD DE MEXICO":
-                return "CDMX"
-            return estado
-    
-    return ""
+    """
+    Extrae el estado de una dirección fiscal: por nombre (coincidencia más
+    larga, la última de la dirección) o, si no aparece, por código postal
+    """
+    return extract_state(address)
 
 
-def _get_scian_from_activity(activity: Dict) -> Optional[str]:
+def _get_scian_from_activities(activities: List[Dict]) -> Optional[str]:
     """
-    Obtiene el código SCIAN de una actividad económica.
-    Nota: Esta es una función simplificada. En producción, 
-    necesitarías un catálogo completo de actividades -> SCIAN
+    Obtiene el código SCIAN de las actividades económicas usando el catálogo
+    indexado de utils/scianIndex.py (ver ese módulo). None si ninguna
+    actividad se reconoce: no se asigna una clase por defecto.
     """
-    activity_name = activity.get('name', '').lower()
-    
-    # Mapeo simplificado de algunas actividades comunes
-    scian_mapping = {
-        'comercio al por mayor': '43',
-        'comercializadora': '434',
-        'impresión': '323',
-        'reparación': '811',
-        'cómputo': '517',
-    }
-    
-    for keyword, code in scian_mapping.items():
-        if keyword in activity_name:
-            # Extender a 6 dígitos con ceros
-            return code.ljust(6, '0')
-    
-    # Por defecto, usar código genérico de servicios financieros
-    return '522190'
+    return scian_from_activities(activities)
 
 
 # ===== Funciones auxiliares para procesamiento de datos de Buró =====
@@ -357,220 +338,286 @@ def _safe_int(value: Any, default: int = 0) -> int:
         return default
 
 
-def _calculate_max_days_overdue(creditos: List[Dict]) -> int:
+# Conversión aproximada a UDIs (1 UDI ≈ 7.5 MXN, puede variar)
+# En producción, deberías usar el valor real de UDI del día
+UDIS_PER_MXN = 1 / 7.5
+
+# Campos de saldo vencido por antigüedad de un crédito financiero
+_SALDO_VENCIDO_FIELDS = (
+    'saldoVencidoDe1a29Dias',
+    'saldoVencidoDe30a59Dias',
+    'saldoVencidoDe60a89Dias',
+    'saldoVencidoDe90a119Dias',
+    'saldoVencidoDe120a179Dias',
+    'saldoVencidoDe180DiasOMas',
+)
+
+# Campos que pueden indicar el monto aprobado de un crédito
+_CREDITO_APROBADO_FIELDS = ('creditoMaximoUtilizado', 'saldoInicial')
+
+# Mapeo de códigos del historial de pagos (historicoPagos) a días aproximados.
+# Formato típico: "00000001112", un dígito por mes:
+# 0 = al corriente, 1 = 1-29 días, 2 = 30-59 días, 3 = 60-89 días,
+# 4 = 90-119 días, 5 = 120-149 días, ...
+_HISTORY_CODE_TO_DAYS = {
+    '0': 0, '1': 15, '2': 45, '3': 75,
+    '4': 105, '5': 135, '6': 165, '7': 195
+}
+
+# historicoPagos va del mes más reciente (primer carácter) al más antiguo
+HISTORY_MOST_RECENT_FIRST = True
+
+# Nivel de atraso (0-7) por byte ASCII del historial; cualquier otro carácter
+# (sin información, o no ASCII tras codificar con 'replace') cuenta como 0
+_HISTORY_LEVELS = bytes(
+    int(chr(byte)) if chr(byte) in _HISTORY_CODE_TO_DAYS else 0 for byte in range(256)
+)
+_LEVEL_DAYS = tuple(_HISTORY_CODE_TO_DAYS[str(level)] for level in range(8))
+
+
+def _decode_payment_history(historia: str) -> bytes:
+    """historicoPagos como un byte por mes (nivel 0-7), del más reciente al más antiguo"""
+    levels = historia.encode('ascii', 'replace').translate(_HISTORY_LEVELS)
+    return levels if HISTORY_MOST_RECENT_FIRST else levels[::-1]
+
+
+# Ventanas de meses de peor_atraso_<n>m
+_HISTORY_WINDOWS = (6, 12, 24)
+_NO_LEVELS = (0,) * len(_HISTORY_WINDOWS)
+
+
+@lru_cache(maxsize=65536)
+def _payment_history_summary(historia: str) -> tuple:
     """
-    Calcula el número máximo de días de atraso entre todos los créditos
+    (días del código máximo, peor nivel en cada ventana de _HISTORY_WINDOWS,
+    meses con atraso, racha actual de meses con atraso) de un historicoPagos
+    no vacío. Los historiales se repiten mucho entre créditos
+    ("000000000000"), así que se decodifican una sola vez.
     """
-    max_days = 0
-    
-    for credito in creditos:
-        # Obtener el atraso mayor del crédito
-        atraso_str = credito.get('atrasoMayor', '0')
-        atraso = _safe_int(atraso_str, 0)
-        
-        if atraso > max_days:
-            max_days = atraso
-        
-        # También revisar el mayor número de días vencido en la historia
-        historia_pagos = credito.get('historicoPagos', '')
-        if historia_pagos:
-            # El historicoPagos puede tener formato como "00000001112" donde cada dígito
-            # representa el estado en un mes (0=al corriente, 1=1-29 días, etc.)
-            max_from_history = _extract_max_days_from_history(historia_pagos)
-            if max_from_history > max_days:
-                max_days = max_from_history
-    
-    return max_days
+    dias = _HISTORY_CODE_TO_DAYS.get(max(historia), 0)
+    levels = _decode_payment_history(historia)
+    meses = len(levels) - levels.count(0)
+    if not meses:
+        return dias, _NO_LEVELS, 0, 0
+    racha = levels.find(0)
+    return (dias, tuple([max(levels[:window]) for window in _HISTORY_WINDOWS]), meses,
+            racha if racha >= 0 else len(levels))
+
 
+# Claves de peor_atraso por ventana, en el orden de _HISTORY_WINDOWS
+_WINDOW_KEYS = tuple(f"peor_atraso_{window}m" for window in _HISTORY_WINDOWS)
 
-def _extract_max_days_from_history(historia: str) -> int:
+
+def _payment_history_metrics(summaries: List[tuple]) -> Dict[str, int]:
     """
-    Extrae el máximo de días de atraso del historial de pagos
-    Formato típico: "00000001112" donde:
-    0 = al corriente
-    1 = 1-29 días
-    2 = 30-59 días
-    3 = 60-89 días
-    4 = 90-119 días
-    5 = 120-149 días
+    Métricas del historial de pagos entre créditos, a partir de los resúmenes
+    (_payment_history_summary) de los historiales con atraso: peor atraso por
+    ventana, meses con atraso (sumados) y mayor racha actual.
+    _aggregate_credit_history solo junta los resúmenes, así que una métrica
+    nueva se agrega solo aquí.
     """
-    if not historia:
-        return 0
-    
-    # Mapeo de códigos a días aproximados
-    code_to_days = {
-        '0': 0, '1': 15, '2': 45, '3': 75, 
-        '4': 105, '5': 135, '6': 165, '7': 195
-    }
-    
-    max_code = max(historia) if historia else '0'
-    return code_to_days.get(max_code, 0)
+    if not summaries:
+        result = dict.fromkeys(_WINDOW_KEYS, _LEVEL_DAYS[0])
+        result["meses_con_atraso"] = 0
+        result["racha_atraso_actual"] = 0
+        return result
+    _, niveles, meses, rachas = zip(*summaries)
+    # Peor nivel de cada ventana entre todos los créditos
+    peores = map(max, *niveles) if len(niveles) > 1 else niveles[0]
+    result = {key: _LEVEL_DAYS[nivel] for key, nivel in zip(_WINDOW_KEYS, peores)}
+    result["meses_con_atraso"] = sum(meses)
+    result["racha_atraso_actual"] = max(rachas)
+    return result
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    """float(value), o None si falta o no es numérico"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
 
 
-def _count_open_performing_loans(creditos: List[Dict]) -> int:
+def _credit_fields(credito: Dict) -> tuple:
     """
-    Cuenta los créditos abiertos con buen desempeño (sin atrasos significativos)
+    Campos de un crédito financiero (dict) que usa _aggregate_credit_history:
+    (atrasoMayor como int, historicoPagos, fechaCierre, apertura,
+    claveObservacion, montos de _SALDO_VENCIDO_FIELDS, montos de
+    _CREDITO_APROBADO_FIELDS), con los montos como float o None.
+    utils/buroSchema.py da la misma tupla para los créditos tipados.
     """
-    count = 0
-    
-    for credito in creditos:
-        # Verificar si el crédito está cerrado
-        fecha_cierre = credito.get('fechaCierre')
-        if fecha_cierre:
-            continue  # Crédito cerrado, no contar
-        
-        # Verificar atraso
-        atraso = _safe_int(credito.get('atrasoMayor', '0'), 0)
-        
-        # Considerar "performing" si tiene menos de 30 días de atraso
-        if atraso < 30:
-            count += 1
-    
-    return count
+    get = credito.get
+    return (
+        _safe_int(get('atrasoMayor')),
+        get('historicoPagos'),
+        get('fechaCierre'),
+        get('apertura'),
+        get('claveObservacion'),
+        [_optional_float(get(field)) for field in _SALDO_VENCIDO_FIELDS],
+        [_optional_float(get(field)) for field in _CREDITO_APROBADO_FIELDS],
+    )
 
 
-def _calculate_max_overdue_balance(creditos_financieros: List[Dict], 
-                                   creditos_comerciales: List[Dict]) -> float:
+def _commercial_overdue(credito: Dict) -> float:
+    """Saldo vencido de un crédito comercial (dict)"""
+    return _safe_float(credito.get('saldoVencido'))
+
+
+def _aggregate_credit_history(creditos_financieros: List[Any],
+                              creditos_comerciales: List[Any],
+                              fecha_limite: datetime,
+                              credit_fields: Callable[[Any], tuple] = _credit_fields,
+                              commercial_overdue: Callable[[Any], float] = _commercial_overdue,
+                              ) -> Dict[str, Any]:
     """
-    Calcula el saldo vencido máximo en UDIs
-    Nota: Asumimos que los saldos vienen en pesos y aplicamos una conversión aproximada
+    Calcula en una sola pasada todas las métricas ch. Los créditos se leen con
+    credit_fields y commercial_overdue (por defecto, dicts); utils/buroSchema.py
+    pasa sus propias funciones para los créditos tipados, así que las reglas
+    están solo aquí.
+    
+    - dias_atraso: máximo entre atrasoMayor y el historial de pagos
+    - num_open_performing_loan: abiertos con menos de 30 días de atraso
+    - creditos_abiertos / pct_open_12m: abiertos y abiertos en los últimos 12 meses
+    - saldo_vencido_maxic_udis: mayor saldo vencido (financiero o comercial) en UDIs
+    - claves_observacion: claves únicas en orden de aparición
+    - maximo_credito_aprobado_historico: máximo entre crédito máximo y saldo inicial
+    - peor_atraso_6m/12m/24m: días del peor código del historial de pagos en los
+      últimos 6, 12 y 24 meses (ver HISTORY_MOST_RECENT_FIRST)
+    - meses_con_atraso: meses con código 1-7, sumados entre créditos
+    - racha_atraso_actual: mayor racha de meses con atraso contando desde el más reciente
     """
+    max_dias = 0
+    num_performing = 0
+    abiertos = 0
+    abiertos_recientes = 0
     max_saldo_vencido = 0.0
+    max_credito = 0.0
+    claves: List[str] = []
+    claves_vistas = set()
+    history_days = _HISTORY_CODE_TO_DAYS
+    con_atraso: List[tuple] = []
     
-    # Procesar créditos financieros
     for credito in creditos_financieros:
-        # Sumar todos los saldos vencidos
-        saldo_vencido_total = 0.0
+        atraso, historia_pagos, fecha_cierre, apertura, clave, saldos, aprobados = credit_fields(credito)
+        
+        # Días de atraso: atrasoMayor y, si existe, el código máximo del historial de pagos
+        if atraso > max_dias:
+            max_dias = atraso
+        if historia_pagos:
+            if isinstance(historia_pagos, str):
+                # Los historiales con atraso van a _payment_history_metrics
+                summary = _payment_history_summary(historia_pagos)
+                if summary[2]:
+                    con_atraso.append(summary)
+                dias_historial = summary[0]
+            else:
+                dias_historial = history_days.get(max(historia_pagos), 0)
+            if dias_historial > max_dias:
+                max_dias = dias_historial
+        
+        # Créditos abiertos (sin fecha de cierre)
+        if not fecha_cierre:
+            abiertos += 1
+            # Considerar "performing" si tiene menos de 30 días de atraso
+            if atraso < 30:
+                num_performing += 1
+            if apertura:
+                fecha_apertura = _parse_date(apertura)
+                if fecha_apertura and fecha_apertura >= fecha_limite:
+                    abiertos_recientes += 1
         
-        saldo_vencido_total += _safe_float(credito.get('saldoVencidoDe1a29Dias', '0'))
-        saldo_vencido_total += _safe_float(credito.get('saldoVencidoDe30a59Dias', '0'))
-        saldo_vencido_total += _safe_float(credito.get('saldoVencidoDe60a89Dias', '0'))
-        saldo_vencido_total += _safe_float(credito.get('saldoVencidoDe90a119Dias', '0'))
-        saldo_vencido_total += _safe_float(credito.get('saldoVencidoDe120a179Dias', '0'))
-        saldo_vencido_total += _safe_float(credito.get('saldoVencidoDe180DiasOMas', '0'))
+        # Suma de saldos vencidos del crédito, en el orden de _SALDO_VENCIDO_FIELDS
+        saldo_vencido = 0.0
+        for value in saldos:
+            if value is not None:
+                saldo_vencido += value
+        if saldo_vencido > max_saldo_vencido:
+            max_saldo_vencido = saldo_vencido
         
-        if saldo_vencido_total > max_saldo_vencido:
-            max_saldo_vencido = saldo_vencido_total
+        if clave:
+            clave = clave.strip()
+            if clave and clave not in claves_vistas:
+                claves_vistas.add(clave)
+                claves.append(clave)
+        
+        # Crédito máximo utilizado y saldo inicial como posible monto aprobado
+        for value in aprobados:
+            if value is not None and value > max_credito:
+                max_credito = value
     
-    # Procesar créditos comerciales
     for credito in creditos_comerciales:
-        saldo_vencido = _safe_float(credito.get('saldoVencido', '0'))
+        saldo_vencido = commercial_overdue(credito)
         if saldo_vencido > max_saldo_vencido:
             max_saldo_vencido = saldo_vencido
     
-    # Conversión aproximada a UDIs (1 UDI ≈ 7.5 MXN, puede variar)
-    # En producción, deberías usar el valor real de UDI del día
-    UDIS_PER_MXN = 1 / 7.5
-    return max_saldo_vencido * UDIS_PER_MXN
+    return {
+        "dias_atraso": max_dias,
+        "num_open_performing_loan": num_performing,
+        "saldo_vencido_maxic_udis": max_saldo_vencido * UDIS_PER_MXN,
+        "creditos_abiertos": abiertos,
+        "pct_open_12m": (abiertos_recientes / abiertos) * 100 if abiertos else 0.0,
+        "claves_observacion": claves,
+        "maximo_credito_aprobado_historico": max_credito,
+        **_payment_history_metrics(con_atraso),
+    }
 
 
-def _count_open_credits(creditos: List[Dict]) -> int:
-    """
-    Cuenta el número total de créditos abiertos
-    """
-    count = 0
-    
-    for credito in creditos:
-        fecha_cierre = credito.get('fechaCierre')
-        if not fecha_cierre:  # No tiene fecha de cierre = está abierto
-            count += 1
-    
-    return count
+# Formatos de fecha aceptados, en orden de prioridad
+_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y%m%d', '%d-%m-%Y')
 
 
-def _calculate_pct_open_12m(creditos: List[Dict]) -> float:
-    """
-    Calcula el porcentaje de créditos abiertos en los últimos 12 meses
-    """
-    from datetime import datetime, timedelta
-    
-    if not creditos:
-        return 0.0
-    
-    fecha_limite = datetime.now() - timedelta(days=365)
-    creditos_recientes = 0
-    total_creditos_abiertos = 0
-    
-    for credito in creditos:
-        # Solo considerar créditos abiertos
-        fecha_cierre = credito.get('fechaCierre')
-        if fecha_cierre:
-            continue
-        
-        total_creditos_abiertos += 1
-        
-        # Verificar fecha de apertura
-        fecha_apertura_str = credito.get('apertura', '')
-        if fecha_apertura_str:
-            try:
-                # Intentar parsear diferentes formatos de fecha
-                fecha_apertura = _parse_date(fecha_apertura_str)
-                if fecha_apertura and fecha_apertura >= fecha_limite:
-                    creditos_recientes += 1
-            except:
-                pass
-    
-    if total_creditos_abiertos == 0:
-        return 0.0
-    
-    return (creditos_recientes / total_creditos_abiertos) * 100
-
-
-def _parse_date(date_str: str) -> Optional[datetime]:
-    """
-    Intenta parsear una fecha en múltiples formatos comunes
-    """
-    if not date_str:
-        return None
-    
-    formats = [
-        '%Y-%m-%d',
-        '%d/%m/%Y',
-        '%Y%m%d',
-        '%d-%m-%Y'
-    ]
-    
-    for fmt in formats:
+def _parse_date_strptime(date_str: Any) -> Optional[datetime]:
+    """Prueba los formatos de _DATE_FORMATS en orden con strptime"""
+    for fmt in _DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt)
-        except:
+        except (ValueError, TypeError):
             continue
-    
     return None
 
 
-def _extract_observation_keys(creditos: List[Dict]) -> List[str]:
+@lru_cache(maxsize=8192)
+def _parse_date_str(date_str: str) -> Optional[datetime]:
     """
-    Extrae las claves de observación de los créditos
+    Detecta el formato por la forma de la cadena y construye la fecha
+    directamente; solo si la forma no es reconocible o la fecha es inválida
+    se recurre a strptime, con el mismo resultado que probar formato por formato.
+    Memoizado: los reportes de buró repiten muchas fechas.
     """
-    claves = []
-    
-    for credito in creditos:
-        clave = credito.get('claveObservacion', '').strip()
-        if clave and clave not in claves:
-            claves.append(clave)
-    
-    return claves
+    length = len(date_str)
+    year = month = day = None
+    if length == 10:
+        if date_str[4] == '-' and date_str[7] == '-':      # %Y-%m-%d
+            year, month, day = date_str[0:4], date_str[5:7], date_str[8:10]
+        elif date_str[2] == '/' and date_str[5] == '/':    # %d/%m/%Y
+            day, month, year = date_str[0:2], date_str[3:5], date_str[6:10]
+        elif date_str[2] == '-' and date_str[5] == '-':    # %d-%m-%Y
+            day, month, year = date_str[0:2], date_str[3:5], date_str[6:10]
+    elif length == 8:                                      # %Y%m%d
+        year, month, day = date_str[0:4], date_str[4:6], date_str[6:8]
+
+    if year is not None:
+        digits = year + month + day
+        if digits.isascii() and digits.isdigit():
+            try:
+                return datetime(int(year), int(month), int(day))
+            except ValueError:
+                pass
+
+    return _parse_date_strptime(date_str)
 
 
-def _calculate_max_approved_credit(creditos: List[Dict]) -> float:
+def _parse_date(date_str: str) -> Optional[datetime]:
     """
-    Calcula el máximo crédito aprobado histórico
+    Intenta parsear una fecha en múltiples formatos comunes
     """
-    max_credito = 0.0
-    
-    for credito in creditos:
-        # Revisar el crédito máximo utilizado
-        credito_max = _safe_float(credito.get('creditoMaximoUtilizado', '0'))
-        if credito_max > max_credito:
-            max_credito = credito_max
-        
-        # También revisar el saldo inicial como posible monto aprobado
-        saldo_inicial = _safe_float(credito.get('saldoInicial', '0'))
-        if saldo_inicial > max_credito:
-            max_credito = saldo_inicial
-    
-    return max_credito
+    if not date_str:
+        return None
+    if isinstance(date_str, str):
+        return _parse_date_str(date_str)
+    return _parse_date_strptime(date_str)
 
 
 # Ejemplo de uso
@@ -0,0 +1,135 @@
+"""
+Proyección de campos (?fields=) sobre documentos JSON ya decodificados.
+
+Sintaxis (similar a la respuesta parcial de las APIs de Google):
+    fields    := selector ("," selector)*
+    selector  := clave ("." clave)* ["(" fields ")"]
+    clave     := nombre con "[]" opcional al final
+
+- Las listas se recorren automáticamente; "[]" solo documenta que se espera una lista.
+- Los paréntesis agrupan sub-campos relativos a la última clave.
+
+Ejemplos:
+    hydra:member(period,netIncome)
+    hydra:member[].period,hydra:totalItems
+    scores.score,scores.source
+
+Ejemplos rechazados con ValueError (400 en los endpoints):
+    hydra:member(period                 sin ')'
+    ".".join(["a"] * 1000)              1000 claves, 1999 caracteres > MAX_DEPTH
+
+Las expresiones compiladas se memoizan, y aplicarlas nunca modifica el
+documento original (que normalmente es un objeto del cache). Las expresiones
+de más de MAX_LENGTH caracteres o con más de MAX_DEPTH niveles se rechazan con
+ValueError antes de recorrerlas. Cada clave de un camino con puntos cuenta como
+un nivel, igual que cada paréntesis, así que un camino largo no llega a agotar
+la recursión de _freeze/_apply aunque quepa en MAX_LENGTH.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+# Árbol compilado: tupla de (clave, subárbol); subárbol None = valor completo
+Projection = Tuple[Tuple[str, Optional["Projection"]], ...]
+
+_SPECIAL = ",.()"
+MAX_LENGTH = 2048
+MAX_DEPTH = 32
+
+
+def _merge(tree: dict, path: list, subtree: Optional[dict]) -> None:
+    """Inserta un selector en el árbol; seleccionar un valor completo tiene prioridad"""
+    node = tree
+    for key in path[:-1]:
+        if key in node and node[key] is None:
+            return
+        node = node.setdefault(key, {})
+    last = path[-1]
+    if subtree is None or node.get(last, {}) is None:
+        node[last] = None
+        return
+    target = node.setdefault(last, {})
+    for key, value in subtree.items():
+        _merge(target, [key], value)
+
+
+def _parse_fields(expr: str, pos: int, depth: int) -> Tuple[dict, int]:
+    tree: dict = {}
+    while True:
+        path = []
+        while True:
+            start = pos
+            while pos < len(expr) and expr[pos] not in _SPECIAL:
+                pos += 1
+            key = expr[start:pos].strip()
+            if key.endswith("[]"):
+                key = key[:-2].rstrip()
+            if not key:
+                raise ValueError(f"Campo vacío en la posición {start} de '{expr}'")
+            path.append(key)
+            if depth + len(path) > MAX_DEPTH:
+                raise ValueError(f"Más de {MAX_DEPTH} niveles de campos en la posición {start}")
+            if pos < len(expr) and expr[pos] == ".":
+                pos += 1
+                continue
+            break
+
+        subtree = None
+        if pos < len(expr) and expr[pos] == "(":
+            if depth + len(path) >= MAX_DEPTH:
+                raise ValueError(f"Más de {MAX_DEPTH} niveles de campos en la posición {pos}")
+            subtree, pos = _parse_fields(expr, pos + 1, depth + len(path))
+            if pos >= len(expr) or expr[pos] != ")":
+                raise ValueError(f"Falta ')' en '{expr}'")
+            pos += 1
+        _merge(tree, path, subtree)
+
+        if pos >= len(expr):
+            if depth:
+                raise ValueError(f"Falta ')' en '{expr}'")
+            return tree, pos
+        if expr[pos] == ",":
+            pos += 1
+            continue
+        if expr[pos] == ")" and depth:
+            return tree, pos
+        raise ValueError(f"Carácter inesperado '{expr[pos]}' en la posición {pos} de '{expr}'")
+
+
+def _freeze(tree: Optional[dict]) -> Optional[Projection]:
+    if tree is None:
+        return None
+    return tuple((key, _freeze(value)) for key, value in tree.items())
+
+
+@lru_cache(maxsize=256)
+def compile_projection(expr: str) -> Projection:
+    """
+    Compila una expresión de campos a un árbol inmutable.
+    Lanza ValueError si la sintaxis es inválida.
+    """
+    if not expr or not expr.strip():
+        raise ValueError("La expresión de campos está vacía")
+    if len(expr) > MAX_LENGTH:
+        raise ValueError(f"La expresión de campos tiene más de {MAX_LENGTH} caracteres")
+    tree, _ = _parse_fields(expr, 0, 0)
+    return _freeze(tree)
+
+
+def _apply(value: Any, projection: Projection) -> Any:
+    if isinstance(value, list):
+        return [_apply(item, projection) for item in value]
+    if isinstance(value, dict):
+        selected = {}
+        for key, subtree in projection:
+            if key in value:
+                selected[key] = value[key] if subtree is None else _apply(value[key], subtree)
+        return selected
+    return value
+
+
+def project(document: Any, fields: Optional[str]) -> Any:
+    """Aplica ?fields= a un documento; sin expresión devuelve el documento tal cual"""
+    if not fields:
+        return document
+    return _apply(document, compile_projection(fields))
@@ -0,0 +1,249 @@
+"""
+Catálogo SCIAN indexado para actividades económicas.
+
+- utils/data/scianCatalogo.json: código SCIAN -> descripción de las clases
+  (6 dígitos) de SCIAN México 2018.
+- utils/data/scianActividades.json: nombres de actividad como los escribe el
+  SAT (o como llegan de los clientes) -> código de clase, para los nombres que
+  no se parecen lo suficiente a la descripción oficial ("Servicios de cómputo",
+  "Construcción de vivienda"). Se indexan como descripciones extra del mismo
+  código. Ambos archivos se cargan una sola vez, en el primer uso.
+- Cada descripción se normaliza (mayúsculas, sin acentos), se parte en palabras
+  sin conectores ("DE", "Y", "AL", ...) ni plurales, y se indexa en un índice
+  invertido palabra -> códigos.
+- Una actividad se compara solo contra los códigos que comparten alguna palabra
+  con su nombre, con similitud coseno ponderada por IDF (las palabras raras,
+  "IMPRESION", pesan más que las comunes, "SERVICIOS", "COMERCIO") por la
+  fracción del peso IDF del nombre que la descripción cubre.
+- Un nombre genérico no se asigna a una clase arbitraria: no hay código si la
+  descripción cubre poco del nombre o si las palabras que coinciden son todas
+  comunes ("Transporte", "Servicios"). Si otro código queda casi empatado, se
+  usa el nivel que comparten los empatados, completado con ceros ("Comercio al
+  por mayor" -> 430000, el sector, como en el mapeo anterior); si no comparten
+  ni el sector, no hay código. Sin código, geo.scian queda en None: no se
+  inventa una clase (antes era una de servicios financieros).
+- Con varias actividades gana el código con más peso acumulado
+  (porcentaje de la actividad x similitud).
+"""
+
+import json
+import math
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .stateIndex import normalize
+
+_CATALOG_FILE = os.path.join(os.path.dirname(__file__), "data", "scianCatalogo.json")
+_ACTIVITIES_FILE = os.path.join(os.path.dirname(__file__), "data", "scianActividades.json")
+
+# Similitud mínima para aceptar una coincidencia
+MIN_SCORE = 0.25
+# Fracción mínima del peso IDF del nombre que debe cubrir la descripción
+MIN_COVERAGE = 0.6
+# Peso IDF mínimo de las palabras que coinciden (una palabra que aparece en
+# unas 20 de las ~1,100 descripciones pesa ~4)
+MIN_WEIGHT = 4.0
+# Los códigos con al menos esta fracción de la similitud del primero quedan
+# empatados: la actividad se asigna al nivel que comparten
+TIE_RATIO = 0.9
+# Dígitos del nivel más específico que se asigna a un empate (4 = rama); el
+# quinto dígito en 0 no es una clase, así que el código no se confunde con una
+SHARED_LEVEL_DIGITS = (2, 3, 4)
+
+_WORD_PATTERN = re.compile(r"[A-Z0-9]+")
+
+_STOPWORDS = frozenset({
+    "A", "AL", "CON", "DE", "DEL", "E", "EL", "EN", "LA", "LAS", "LO", "LOS",
+    "O", "OTRA", "OTRAS", "OTRO", "OTROS", "PARA", "POR", "SIN", "SU", "SUS",
+    "U", "UN", "UNA", "Y", "EXCEPTO", "SIMILARES", "RELACIONADOS",
+})
+
+# Palabras de nombres de actividad que el catálogo dice de otra forma
+# (una comercializadora suele vender al por mayor)
+_SYNONYMS = {
+    "COMERCIALIZADORA": ("COMERCIO", "MAYOR"),
+    "COMERCIALIZACION": ("COMERCIO",),
+    "RENTA": ("ALQUILER",),
+    "ARRENDAMIENTO": ("ALQUILER",),
+    "RESTAURANTE": ("RESTAURANT",),
+}
+
+
+def _stem(word: str) -> str:
+    """Singular aproximado: "PRODUCTOS" -> "PRODUCTO", "ANIMALES" -> "ANIMAL" """
+    if len(word) > 4 and word.endswith("ES") and word[-3] not in "AEIOU":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("S"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras normalizadas de una descripción, sin conectores ni plurales"""
+    tokens = []
+    for word in _WORD_PATTERN.findall(normalize(text)):
+        if word in _SYNONYMS:
+            tokens.extend(_SYNONYMS[word])
+        elif word not in _STOPWORDS:
+            tokens.append(_stem(word))
+    return tokens
+
+
+@lru_cache(maxsize=None)
+def _catalog_index():
+    """(códigos, IDF por palabra, norma por entrada, índice invertido palabra -> posiciones)"""
+    with open(_CATALOG_FILE, "r", encoding="utf-8") as f:
+        catalog: Dict[str, str] = json.load(f)
+    with open(_ACTIVITIES_FILE, "r", encoding="utf-8") as f:
+        activities: Dict[str, str] = json.load(f)
+
+    # Una entrada por descripción: primero las del catálogo, después los nombres extra
+    entries = list(catalog.items()) + [(code, name) for name, code in activities.items()]
+    codes = [code for code, _ in entries]
+    words = [frozenset(tokenize(description)) for _, description in entries]
+
+    postings = defaultdict(list)
+    for position, entry_words in enumerate(words):
+        for word in entry_words:
+            postings[word].append(position)
+
+    idf = {word: math.log(1 + len(codes) / len(found)) for word, found in postings.items()}
+    norms = [math.sqrt(sum(idf[word] ** 2 for word in entry_words)) for entry_words in words]
+    return codes, idf, norms, dict(postings)
+
+
+@lru_cache(maxsize=4096)
+def match_activity(name: str) -> Optional[Tuple[str, float]]:
+    """
+    Código SCIAN (6 dígitos) más parecido a un nombre de actividad y su
+    similitud; None si no hay uno claro (ver el docstring del módulo)
+    """
+    codes, idf, norms, postings = _catalog_index()
+    query = set(tokenize(name))
+    if not query.intersection(idf):
+        return None
+
+    # Una palabra que no está en el catálogo cuenta como la más rara: "Servicios
+    # de cómputo" no debe parecerse a cualquier código solo por "SERVICIOS"
+    unknown = math.log(1 + len(codes))
+    query_norm = math.sqrt(sum(idf.get(word, unknown) ** 2 for word in query))
+    query_weight = sum(idf.get(word, unknown) for word in query)
+
+    dot = defaultdict(float)
+    matched = defaultdict(float)
+    for word in query.intersection(idf):
+        weight = idf[word]
+        for position in postings[word]:
+            dot[position] += weight * weight
+            matched[position] += weight
+
+    # Mejor entrada por código; a igual similitud gana la primera del catálogo
+    best: Dict[str, Tuple[float, int]] = {}
+    for position in sorted(dot):
+        score = dot[position] / (query_norm * norms[position]) * matched[position] / query_weight
+        code = codes[position]
+        if code not in best or score > best[code][0]:
+            best[code] = (score, position)
+    ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[1][1]))
+
+    code, (score, position) = ranked[0]
+    if score < MIN_SCORE or matched[position] < MIN_WEIGHT \
+            or matched[position] < MIN_COVERAGE * query_weight:
+        return None
+    tied = [other for other, (other_score, _) in ranked[1:] if other_score >= TIE_RATIO * score]
+    if tied:
+        shared = _shared_level(code, tied)
+        return (shared, score) if shared else None
+    return code, score
+
+
+def _shared_level(code: str, tied: List[str]) -> Optional[str]:
+    """Nivel SCIAN más específico que comparten los códigos empatados ("43" -> "430000")"""
+    for digits in reversed(SHARED_LEVEL_DIGITS):
+        prefix = code[:digits]
+        if all(other.startswith(prefix) for other in tied):
+            return prefix.ljust(6, "0")
+    return None
+
+
+def _percentage(activity: Dict) -> float:
+    """Porcentaje de la actividad; 1 si no viene o no es numérico"""
+    try:
+        percentage = float(activity.get("percentage"))
+    except (TypeError, ValueError):
+        return 1.0
+    return percentage if percentage > 0 else 0.0
+
+
+def scian_from_activities(activities: Iterable[Dict]) -> Optional[str]:
+    """
+    Código SCIAN de una lista de economicActivities ({name, percentage}).
+    Cada actividad reconocida suma porcentaje x similitud a su código; sin
+    porcentajes, todas pesan igual. None si ninguna se reconoce.
+    """
+    totals: Dict[str, float] = defaultdict(float)
+    for activity in activities:
+        match = match_activity(str(activity.get("name") or ""))
+        if match is None:
+            continue
+        code, score = match
+        totals[code] += _percentage(activity) * score
+
+    if not totals:
+        return None
+    # max conserva el primero en caso de empate (orden de las actividades)
+    return max(totals, key=totals.get)
+
+
+# Nombres de actividad y el código que deben obtener, None si son demasiado
+# genéricos (python -m utils.scianIndex los verifica). Incluye las palabras
+# clave del mapeo anterior (comercio al por mayor -> 43, impresión -> 323,
+# reparación -> 811, cómputo -> 5415; antes 517, un subsector de
+# telecomunicaciones)
+EXAMPLES = (
+    ("Comercio al por mayor", "430000"),
+    ("Comercializadora", "430000"),
+    ("Comercio al por menor", "460000"),
+    ("Comercio", None),
+    ("Servicios", None),
+    ("Transporte", None),
+    ("Fabricación", None),
+    ("Construcción", None),
+    ("Venta de ropa", None),
+    ("Comercializadora de abarrotes", "431110"),
+    ("Comercio al por mayor de ropa", "432120"),
+    ("Servicios de impresión", "323119"),
+    ("Impresión", "323119"),
+    ("Reparación de maquinaria", "811312"),
+    ("Reparación de automóviles", "811111"),
+    ("Servicios de cómputo", "541510"),
+    ("Servicios de computación", "541510"),
+    ("Servicios de consultoría en computación", "541510"),
+    ("Agencias de publicidad", "541810"),
+    ("Servicios de contabilidad y auditoría", "541211"),
+    ("Restaurantes", "722511"),
+    ("Restaurante de comida corrida", "722511"),
+    ("Restaurantes sin bar y con servicio de meseros", "722511"),
+    ("Alquiler de oficinas y locales comerciales", "531114"),
+    ("Renta de oficinas", "531114"),
+    ("Construcción de vivienda", "236111"),
+    ("Transporte de carga", "484129"),
+    ("Cultivo de aguacate", "111334"),
+    ("Farmacias", "464111"),
+)
+
+
+if __name__ == "__main__":
+    failures = []
+    for name, expected in EXAMPLES:
+        match = match_activity(name)
+        if (match and match[0]) != expected:
+            failures.append((name, expected, match and match[0]))
+    for name, expected, actual in failures:
+        print(f"❌ {name!r}: se esperaba {expected!r}, se obtuvo {actual!r}")
+    if failures:
+        raise SystemExit(1)
+    print(f"✅ {len(EXAMPLES)} actividades de ejemplo")
@@ -0,0 +1,88 @@
+"""
+Índices de ordenamiento para colecciones hydra (p. ej. customer-network).
+
+Los índices se construyen una sola vez por entrada de cache y guardan, para
+cada campo escalar de los miembros, las posiciones ordenadas ascendente y
+descendente. Paginar con ?sort=&offset=&limit= es entonces un slice del
+índice: O(página) por petición en lugar de reordenar toda la colección.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+MEMBERS_KEY = "hydra:member"
+
+# campo -> (orden ascendente, orden descendente); los nulos siempre al final
+SortIndex = Dict[str, Tuple[List[int], List[int]]]
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def build_sort_index(document: Any) -> SortIndex:
+    """Construye el índice de todos los campos escalares de hydra:member"""
+    members = document.get(MEMBERS_KEY) if isinstance(document, dict) else None
+    if not isinstance(members, list):
+        return {}
+
+    fields: Dict[str, None] = {}
+    for member in members:
+        if isinstance(member, dict):
+            for key, value in member.items():
+                if not isinstance(value, (dict, list)):
+                    fields.setdefault(key)
+
+    index: SortIndex = {}
+    for field in fields:
+        values = [member.get(field) if isinstance(member, dict) else None for member in members]
+        present = [(pos, value) for pos, value in enumerate(values) if value is not None]
+        numbers = [_as_number(value) for _, value in present]
+
+        if all(number is not None for number in numbers):
+            keyed = [(number, pos) for (pos, _), number in zip(present, numbers)]
+        else:
+            keyed = [(str(value).casefold(), pos) for pos, value in present]
+
+        nulls = [pos for pos, value in enumerate(values) if value is None]
+        ascending = [pos for _, pos in sorted(keyed, key=lambda item: item[0])]
+        descending = [pos for _, pos in sorted(keyed, key=lambda item: item[0], reverse=True)]
+        index[field] = (ascending + nulls, descending + nulls)
+
+    return index
+
+
+def paginate(
+    document: Dict[str, Any],
+    index: SortIndex,
+    limit: Optional[int],
+    offset: int = 0,
+    sort: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Devuelve una copia superficial del documento con una página de hydra:member.
+    sort acepta un campo con "-" opcional para orden descendente (p. ej. -netReceived).
+    Lanza KeyError si el campo de ordenamiento no existe.
+    """
+    members = document.get(MEMBERS_KEY) or []
+    end = None if limit is None else offset + limit
+
+    if sort:
+        field = sort.lstrip("-")
+        if field not in index:
+            raise KeyError(field)
+        ascending, descending = index[field]
+        order = descending if sort.startswith("-") else ascending
+        page = [members[pos] for pos in order[offset:end]]
+    else:
+        page = members[offset:end]
+
+    return {**document, MEMBERS_KEY: page}
@@ -0,0 +1,166 @@
+"""
+Índice de estados de México para direcciones fiscales.
+
+- Los nombres de estado y sus variantes (p. ej. "ESTADO DE MEXICO", "D.F.",
+  "VERACRUZ DE IGNACIO DE LA LLAVE") se compilan en una sola expresión regular
+  con las alternativas de la más larga a la más corta: "BAJA CALIFORNIA SUR" y
+  "CIUDAD DE MEXICO" se reconocen completos, sin depender del orden de una lista.
+  La dirección se recorre una vez y gana la última coincidencia (el estado
+  suele ir al final). Un "MEXICO" al final de la dirección es el país si va
+  después de un código postal o pegado a otro estado, y entonces se ignora.
+- Código postal: el último número de 5 dígitos, buscado en
+  utils/data/cpEstados.json por sus dos primeros dígitos (rangos de SEPOMEX).
+  Se usa si no hay nombre de estado o si el código aparece después del último
+  nombre (que entonces suele ser una calle o colonia, p. ej. "Calle Jalisco").
+
+La expresión y la tabla se cargan una sola vez, en el primer uso.
+"""
+
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Optional
+
+_CP_TABLE_FILE = os.path.join(os.path.dirname(__file__), "data", "cpEstados.json")
+
+# Estado normalizado -> variantes como aparecen en direcciones (sin acentos, en mayúsculas)
+STATE_ALIASES: Dict[str, tuple] = {
+    "AGUASCALIENTES": ("AGUASCALIENTES",),
+    "BAJA CALIFORNIA": ("BAJA CALIFORNIA",),
+    "BAJA CALIFORNIA SUR": ("BAJA CALIFORNIA SUR",),
+    "CAMPECHE": ("CAMPECHE",),
+    "CHIAPAS": ("CHIAPAS",),
+    "CHIHUAHUA": ("CHIHUAHUA",),
+    "COAHUILA": ("COAHUILA", "COAHUILA DE ZARAGOZA"),
+    "COLIMA": ("COLIMA",),
+    "DURANGO": ("DURANGO",),
+    "GUANAJUATO": ("GUANAJUATO",),
+    "GUERRERO": ("GUERRERO",),
+    "HIDALGO": ("HIDALGO",),
+    "JALISCO": ("JALISCO",),
+    "MEXICO": ("MEXICO", "ESTADO DE MEXICO", "EDO. DE MEXICO", "EDO DE MEXICO", "EDO. MEX.", "EDOMEX"),
+    "MICHOACAN": ("MICHOACAN", "MICHOACAN DE OCAMPO"),
+    "MORELOS": ("MORELOS",),
+    "NAYARIT": ("NAYARIT",),
+    "NUEVO LEON": ("NUEVO LEON",),
+    "OAXACA": ("OAXACA",),
+    "PUEBLA": ("PUEBLA",),
+    "QUERETARO": ("QUERETARO", "QUERETARO DE ARTEAGA"),
+    "QUINTANA ROO": ("QUINTANA ROO",),
+    "SAN LUIS POTOSI": ("SAN LUIS POTOSI",),
+    "SINALOA": ("SINALOA",),
+    "SONORA": ("SONORA",),
+    "TABASCO": ("TABASCO",),
+    "TAMAULIPAS": ("TAMAULIPAS",),
+    "TLAXCALA": ("TLAXCALA",),
+    "VERACRUZ": ("VERACRUZ", "VERACRUZ DE IGNACIO DE LA LLAVE"),
+    "YUCATAN": ("YUCATAN",),
+    "ZACATECAS": ("ZACATECAS",),
+    "CDMX": ("CDMX", "CIUDAD DE MEXICO", "CD. DE MEXICO", "CD DE MEXICO",
+             "DISTRITO FEDERAL", "D.F.", "D. F."),
+}
+
+# Un código postal: 5 dígitos que no forman parte de un número más largo
+_CP_PATTERN = re.compile(r"(?<!\d)(\d{5})(?!\d)")
+
+# Lo que puede separar un estado de un "MEXICO" final que indica el país
+_COUNTRY_SEPARATOR = re.compile(r"(?:[\s,.:\-]+|C\.?\s?P\.?|\d{5})*")
+# Lo que puede seguir al país al final de la dirección
+_TRAILING = re.compile(r"[^A-Z0-9]*")
+
+
+def normalize(text: str) -> str:
+    """Mayúsculas y sin acentos ("Querétaro" -> "QUERETARO")"""
+    decomposed = unicodedata.normalize("NFKD", text.upper())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=None)
+def _state_pattern():
+    """Expresión única con todas las variantes, de la más larga a la más corta"""
+    variants = {alias: state for state, aliases in STATE_ALIASES.items() for alias in aliases}
+    alternation = "|".join(
+        re.escape(alias) for alias in sorted(variants, key=len, reverse=True)
+    )
+    return re.compile(rf"(?<![A-Z0-9])(?:{alternation})(?![A-Z0-9])"), variants
+
+
+@lru_cache(maxsize=None)
+def _cp_table() -> Dict[str, str]:
+    """Prefijo de 2 dígitos del código postal -> estado"""
+    with open(_CP_TABLE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _last_state_match(text: str, codes: list) -> Optional[re.Match]:
+    """
+    Última mención de un estado. Un "MEXICO" al final de la dirección es el país
+    (y se ignora) si antes hay un código postal o si va pegado a otro estado.
+    """
+    pattern, _ = _state_pattern()
+    matches = list(pattern.finditer(text))
+    if not matches:
+        return None
+    last = matches[-1]
+    if last.group() != "MEXICO" or not _TRAILING.fullmatch(text, last.end()):
+        return last
+    previous = matches[-2] if len(matches) > 1 else None
+    if codes and codes[0].start() < last.start():
+        # "..., Guadalajara, Jal., C.P. 44100, Mexico": manda el código postal
+        return previous
+    if previous is not None and _COUNTRY_SEPARATOR.fullmatch(text, previous.end(), last.start()):
+        # "..., JALISCO, MEXICO": el estado es el anterior
+        return previous
+    return last
+
+
+def extract_state(address: str) -> str:
+    """
+    Estado de una dirección fiscal (cadena vacía si no se reconoce).
+    Si el último código postal aparece después del último nombre de estado,
+    manda el código postal: así "Calle Jalisco 5, Roma Nte, 06700" es CDMX.
+    """
+    if not address:
+        return ""
+    text = normalize(address)
+    codes = list(_CP_PATTERN.finditer(text))
+    match = _last_state_match(text, codes)
+
+    if codes and (match is None or match.end() <= codes[-1].start()):
+        state = _cp_table().get(codes[-1].group(1)[:2])
+        if state:
+            return state
+
+    if match is None:
+        return ""
+    _, variants = _state_pattern()
+    return variants[match.group()]
+
+
+# Direcciones de ejemplo y su estado esperado (python -m utils.stateIndex las verifica)
+EXAMPLES = (
+    ("Av. Juárez 100, Guadalajara, Jal., C.P. 44100, Mexico", "JALISCO"),
+    ("Av. Hidalgo 5, Puebla, Pue. 72000, MÉXICO", "PUEBLA"),
+    ("Av. Vallarta 500, Guadalajara, Jalisco, 44100, México", "JALISCO"),
+    ("Calle Morelos 10, Centro, Monterrey, Nuevo León, México", "NUEVO LEON"),
+    ("CALLE JOSE MARIA MORELOS 5, TLALNEPANTLA, MEXICO", "MEXICO"),
+    ("Calle Morelos 5, Tlalnepantla, 54000, México", "MEXICO"),
+    ("Blvd. Ávila Camacho 40, Naucalpan, Estado de México", "MEXICO"),
+    ("Calle Jalisco 5, Roma Nte, 06700", "CDMX"),
+    ("Insurgentes Sur 1000, Del Valle, Ciudad de México, C.P. 03100, México", "CDMX"),
+    ("Paseo de la Reforma 222, Juárez, CDMX", "CDMX"),
+    ("Calle 60 No. 500, Mérida, Yucatán", "YUCATAN"),
+    ("Sin estado reconocible", ""),
+)
+
+
+if __name__ == "__main__":
+    failures = [(address, expected, extract_state(address))
+                for address, expected in EXAMPLES if extract_state(address) != expected]
+    for address, expected, actual in failures:
+        print(f"❌ {address!r}: se esperaba {expected!r}, se obtuvo {actual!r}")
+    if failures:
+        raise SystemExit(1)
+    print(f"✅ {len(EXAMPLES)} direcciones de ejemplo")
@@ -0,0 +1,359 @@
+"""
+Módulo: syntageStandIn
+
+Sustituto local de la API de Syntage para desarrollo y pruebas de carga.
+Sirve todas las rutas que consulta controllers/syntage_data_controller.py
+(INSIGHTS y /entities) con las respuestas guardadas en cache.json, para
+cualquier entity_id o RFC. Las rutas sin respuesta en cache.json usan
+utils/dataMock.py o una respuesta mínima (reportes de buró con dos créditos).
+
+Simula el comportamiento de upstream:
+- latencia por petición con una distribución configurable (ver parse_latency);
+- errores 500 con probabilidad `error_rate`;
+- 429 con probabilidad `throttle_rate`, o al superar `rate_limit` peticiones
+  por segundo (token bucket), con cabecera Retry-After;
+- paginación de colecciones hydra con ?page=&itemsPerPage= (y `page_size`
+  por defecto), con hydra:view y enlaces hydra:next/hydra:previous.
+
+Exige la cabecera X-API-Key (401 si falta), como la API real. Cuenta las
+peticiones por ruta y código de respuesta: GET /__stats las devuelve y
+DELETE /__stats las reinicia.
+
+Para apuntar el proxy al sustituto:
+    SYNTAGE_BASE_URL=http://127.0.0.1:9100 SYNTAGE_API_KEY=local uvicorn main:app
+
+Uso por línea de comandos:
+    python -m utils.syntageStandIn --port 9100 --latency lognormal:80:0.5 --error-rate 0.01
+    python -m utils.syntageStandIn --self-test   # verifica LATENCY_EXAMPLES
+"""
+
+import argparse
+import http.server
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from .dataMock import get_invoicing_annual_comparison_mock
+
+_CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache.json")
+
+# Rutas por recurso ("{id}" es el entity_id o RFC); deben cubrir INSIGHTS
+ROUTES = (
+    "/entities",
+    "/entities/{id}/insights/metrics/invoicing-annual-comparison",
+    "/entities/{id}/insights/metrics/vendor-network",
+    "/entities/{id}/insights/metrics/customer-network",
+    "/entities/{id}/insights/metrics/scores",
+    "/entities/{id}/datasources/mx/buro-de-credito/reports",
+    "/insights/{id}/financial-ratios",
+    "/insights/{id}/customer-concentration",
+    "/insights/{id}/financial-institutions",
+    "/insights/{id}/supplier-concentration",
+    "/insights/{id}/employees",
+    "/insights/{id}/expenditures",
+    "/insights/{id}/government-customers",
+    "/insights/{id}/invoicing-blacklist",
+    "/insights/{id}/risks",
+    "/insights/{id}/sales-revenue",
+    "/insights/{id}/trial-balance",
+    "/insights/{id}/cash-flow",
+    "/insights/{id}/summary",
+)
+
+_BURO_REPORTS = {
+    "@context": "/contexts/BuroDeCreditoReport",
+    "@type": "hydra:Collection",
+    "hydra:totalItems": 1,
+    "hydra:member": [{
+        "id": "standin-buro-report",
+        "provider": "Buro",
+        "createdAt": "2025-05-30T00:00:00.000000Z",
+        "data": {
+            "creditoFinanciero": [
+                {"atrasoMayor": "15", "historicoPagos": "00000001110", "apertura": "2023-01-15",
+                 "creditoMaximoUtilizado": "500000", "saldoInicial": "500000",
+                 "saldoVencidoDe1a29Dias": "5000"},
+                {"atrasoMayor": "0", "historicoPagos": "000000000", "apertura": "2024-06-01",
+                 "creditoMaximoUtilizado": "200000", "saldoInicial": "200000", "fechaCierre": None},
+            ],
+            "creditoComercial": [{"saldoVencido": "0"}],
+        },
+    }],
+}
+
+
+def _route_pattern(route: str) -> "re.Pattern":
+    return re.compile("^" + re.escape(route).replace(re.escape("{id}"), "[^/]+") + "$")
+
+
+def load_fixtures(cache_file: str = _CACHE_FILE) -> Dict[str, Any]:
+    """Respuesta por ruta de ROUTES, tomada de cache.json (sin importar la expiración)"""
+    fixtures: Dict[str, Any] = {}
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        patterns = [(route, _route_pattern(route)) for route in ROUTES]
+        for url, entry in entries.items():
+            path = urlsplit(url).path
+            for route, pattern in patterns:
+                if pattern.match(path):
+                    fixtures.setdefault(route, entry["value"])
+                    break
+
+    fixtures.setdefault("/entities/{id}/insights/metrics/invoicing-annual-comparison",
+                        get_invoicing_annual_comparison_mock())
+    fixtures.setdefault("/entities/{id}/datasources/mx/buro-de-credito/reports", _BURO_REPORTS)
+    for route in ROUTES:
+        fixtures.setdefault(route, {"data": []})
+    return fixtures
+
+
+# Distribución -> (número de parámetros, función de muestreo en milisegundos)
+_LATENCY_DISTRIBUTIONS: Dict[str, Tuple[int, Callable[[random.Random, list], float]]] = {
+    "0": (0, lambda rnd, values: 0.0),
+    "none": (0, lambda rnd, values: 0.0),
+    "fixed": (1, lambda rnd, values: values[0]),
+    "uniform": (2, lambda rnd, values: rnd.uniform(values[0], values[1])),
+    "normal": (2, lambda rnd, values: max(0.0, rnd.gauss(values[0], values[1]))),
+    "lognormal": (2, lambda rnd, values: rnd.lognormvariate(math.log(values[0]), values[1])),
+    "exp": (1, lambda rnd, values: rnd.expovariate(1 / values[0])),
+}
+
+
+def parse_latency(spec: str, rnd: random.Random) -> Callable[[], float]:
+    """
+    Distribución de latencia en milisegundos -> función que da segundos:
+        0 | fixed:MS | uniform:MIN:MAX | normal:MEDIA:DESV | lognormal:MEDIANA:SIGMA | exp:MEDIA
+    Una especificación inválida ("normal:50", "exp:0", "fixed:-50") falla aquí,
+    al arrancar, y no en cada petición.
+    """
+    kind, _, params = spec.partition(":")
+    if kind not in _LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Distribución de latencia inválida: {spec!r}")
+    count, sample = _LATENCY_DISTRIBUTIONS[kind]
+    try:
+        values = [float(value) for value in params.split(":")] if params else []
+        if len(values) != count:
+            raise ValueError(f"se esperaban {count} parámetros")
+        if any(value < 0 for value in values):
+            raise ValueError("los parámetros no pueden ser negativos")
+        # Una muestra de prueba detecta parámetros fuera de dominio (mediana o media 0)
+        sample(random.Random(0), values)
+    except (ValueError, ZeroDivisionError) as e:
+        raise ValueError(f"Distribución de latencia inválida: {spec!r} ({e})") from None
+    return lambda: sample(rnd, values) / 1000
+
+
+# Especificaciones de latencia y si deben aceptarse (python -m utils.syntageStandIn --self-test)
+LATENCY_EXAMPLES = (
+    ("0", True),
+    ("fixed:50", True),
+    ("uniform:20:80", True),
+    ("normal:50:10", True),
+    ("lognormal:80:0.5", True),
+    ("exp:40", True),
+    ("normal:50", False),
+    ("uniform:20", False),
+    ("fixed", False),
+    ("fixed:50:10", False),
+    ("lognormal:0:0.5", False),
+    ("exp:0", False),
+    ("fixed:-50", False),
+    ("uniform:-10:-5", False),
+    ("exp:-40", False),
+    ("fixed:abc", False),
+    ("gamma:2:3", False),
+)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+def _paginate(document: Any, path: str, query: Dict[str, list], page_size: int) -> Any:
+    """Página de una colección hydra; sin paginación si no se pide ni hay page_size"""
+    if not isinstance(document, dict) or not isinstance(document.get("hydra:member"), list):
+        return document
+    try:
+        per_page = int(query.get("itemsPerPage", [page_size])[0])
+        page = max(1, int(query.get("page", [1])[0]))
+    except ValueError:
+        return document
+    if per_page <= 0:
+        return document
+
+    members = document["hydra:member"]
+    last = max(1, math.ceil(len(members) / per_page))
+
+    def link(number: int) -> str:
+        return f"{path}?{urlencode({'page': number, 'itemsPerPage': per_page})}"
+
+    view = {"@id": link(page), "@type": "hydra:PartialCollectionView",
+            "hydra:first": link(1), "hydra:last": link(last)}
+    if page > 1:
+        view["hydra:previous"] = link(page - 1)
+    if page < last:
+        view["hydra:next"] = link(page + 1)
+    return {**document, "hydra:totalItems": len(members),
+            "hydra:member": members[(page - 1) * per_page:page * per_page], "hydra:view": view}
+
+
+class SyntageStandIn:
+    """Estado compartido del sustituto: fixtures, simulación y contadores"""
+
+    def __init__(self, latency: str = "0", error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 rate_limit: float = 0.0, page_size: int = 0, seed: Optional[int] = None,
+                 cache_file: str = _CACHE_FILE):
+        self.rnd = random.Random(seed)
+        self.latency = parse_latency(latency, self.rnd)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.bucket = _TokenBucket(rate_limit) if rate_limit > 0 else None
+        self.page_size = page_size
+        self.fixtures = load_fixtures(cache_file)
+        self.routes = [(route, _route_pattern(route)) for route in ROUTES]
+        self.counts: Dict[str, Counter] = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            routes = {route: dict(statuses) for route, statuses in self.counts.items()}
+        return {"requests": sum(sum(statuses.values()) for statuses in routes.values()), "routes": routes}
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+    def _count(self, route: str, status: int):
+        with self.lock:
+            self.counts[route][status] += 1
+
+    def respond(self, target: str, headers) -> Tuple[int, Dict[str, str], Any]:
+        """(código, cabeceras, cuerpo) para un GET; duerme la latencia simulada"""
+        parts = urlsplit(target)
+        route = next((route for route, pattern in self.routes if pattern.match(parts.path)), None)
+        if route is None:
+            return 404, {}, {"message": "Not Found"}
+
+        time.sleep(self.latency())
+        if not headers.get("X-API-Key"):
+            status, extra, body = 401, {}, {"message": "Missing API key"}
+        elif (self.bucket is not None and not self.bucket.take()) or self.rnd.random() < self.throttle_rate:
+            status, extra, body = 429, {"Retry-After": "1"}, {"message": "Too Many Requests"}
+        elif self.rnd.random() < self.error_rate:
+            status, extra, body = 500, {}, {"message": "Internal Server Error (simulado)"}
+        else:
+            status, extra = 200, {}
+            body = _paginate(self.fixtures[route], parts.path, parse_qs(parts.query), self.page_size)
+        self._count(route, status)
+        return status, extra, body
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, **options) -> http.server.ThreadingHTTPServer:
+    """
+    Levanta el sustituto en un hilo daemon. Con port=0 se elige un puerto libre.
+    El servidor retornado expone .url, .standin (SyntageStandIn) y shutdown().
+    """
+    standin = SyntageStandIn(**options)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: Any, extra: Optional[Dict[str, str]] = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/ld+json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (extra or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/__stats":
+                self._send(200, standin.stats())
+                return
+            status, extra, body = standin.respond(self.path, self.headers)
+            self._send(status, body, extra)
+
+        def do_DELETE(self):
+            if self.path == "/__stats":
+                standin.reset()
+                self._send(200, {"reset": True})
+            else:
+                self._send(404, {"message": "Not Found"})
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.standin = standin
+    server.url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sustituto local de la API de Syntage")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="0", help="p. ej. fixed:50, uniform:20:80, lognormal:80:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probabilidad de 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="probabilidad de 429")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="peticiones/s antes de responder 429")
+    parser.add_argument("--page-size", type=int, default=0, help="itemsPerPage por defecto (0 = sin paginar)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--self-test", action="store_true", help="verifica LATENCY_EXAMPLES y termina")
+    args = parser.parse_args()
+
+    if args.self_test:
+        failures = []
+        for spec, valid in LATENCY_EXAMPLES:
+            try:
+                delay = parse_latency(spec, random.Random(0))()
+                accepted = delay >= 0
+            except ValueError:
+                accepted = False
+            if accepted != valid:
+                failures.append(spec)
+                print(f"❌ {spec!r}: se esperaba {'aceptarla' if valid else 'rechazarla'}")
+        if failures:
+            raise SystemExit(1)
+        print(f"✅ {len(LATENCY_EXAMPLES)} especificaciones de latencia")
+        return
+
+    server = serve(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                   throttle_rate=args.throttle_rate, rate_limit=args.rate_limit,
+                   page_size=args.page_size, seed=args.seed)
+    print(f"🧪 Sustituto de Syntage en {server.url}")
+    print(f"   Exporta SYNTAGE_BASE_URL={server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,473 @@
+"""
+Grabación y reproducción del tráfico hacia Syntage.
+
+Con SYNTAGE_RECORD_DIR=<dir>, cada respuesta de upstream se guarda en <dir>:
+- blobs/<sha[:2]>/<sha>.gz: el cuerpo (ya redactado) comprimido con gzip y
+  direccionado por su SHA-256, así que respuestas iguales se guardan una vez;
+- index.jsonl: una línea por petición con método, ruta (redactada), código,
+  tipo de contenido, tiempo de upstream en ms, tamaño original y blob.
+
+Redacción determinista (la misma entrada siempre da la misma salida, así que
+las relaciones entre respuestas se conservan):
+- RFCs en cualquier texto y en la ruta: otro RFC con la misma forma (letras,
+  una fecha AAMMDD válida y homoclave);
+- valores de llaves de nombre de personas y contrapartes (name, nombre,
+  razonSocial, customer, vendor, supplier, emisor, receptor, ...):
+  "NOMBRE <hash>". Se exceptúan las etiquetas de catálogo de _CATALOG_PARENTS
+  (economicActivities[].name, taxRegimes[].name): no identifican a nadie y el
+  mapping las necesita (p. ej. el SCIAN sale del nombre de la actividad).
+Los seudónimos son un HMAC con sal: sin ella, los RFCs (un espacio pequeño y
+con estructura) se podrían recuperar probando todos. La sal es
+SYNTAGE_REDACTION_SALT o, si no se define, una aleatoria por grabación: se
+genera al crear la grabación, se guarda fuera de ella en
+SYNTAGE_REDACTION_DIR/<id>.salt (por defecto .syntage-redaction/, ignorado
+por git y Docker) y la grabación solo guarda su id (recording-id). Para
+reproducir en otra máquina una grabación con sal aleatoria, hay que copiar
+ese archivo o definir SYNTAGE_REDACTION_SALT con su contenido.
+
+python -m utils.upstreamRecorder check <dir> revisa una grabación: busca en
+index.jsonl y en los blobs descomprimidos los nombres y RFCs en claro de los
+datos del sustituto de Syntage (utils/syntageStandIn.py, que los toma de
+cache.json) y termina con error si encuentra alguno.
+
+Con SYNTAGE_REPLAY_DIR=<dir>, las peticiones se responden desde una grabación,
+sin red: la ruta pedida se redacta igual que al grabar y se reproducen sus
+respuestas en orden (en ciclo si se piden más veces), esperando el tiempo
+original de upstream multiplicado por SYNTAGE_REPLAY_LATENCY_SCALE (1 por
+defecto). Una ruta sin grabación responde 404.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# Sin \b al inicio: un RFC puede empezar con "&", que no es carácter de palabra
+_RFC_PATTERN = re.compile(r"(?<![A-ZÑ&0-9])([A-ZÑ&]{3,4})(\d{6})([A-Z0-9]{3})(?![A-Z0-9])")
+# Llaves cuyo valor (si es texto) es el nombre de una persona o de una contraparte
+# (p. ej. customer/vendor en customer-network y vendor-network)
+_NAME_KEYS = frozenset(key.lower() for key in (
+    "name", "nombre", "nombres", "razonSocial", "legalName", "businessName", "fullName",
+    "nombreCompleto", "firstName", "middleName", "lastName", "secondLastName", "surname",
+    "apellidoPaterno", "apellidoMaterno", "displayName", "tradeName", "nombreComercial",
+    "customer", "customerName", "client", "clientName", "cliente", "nombreCliente",
+    "vendor", "vendorName", "supplier", "supplierName", "proveedor", "nombreProveedor",
+    "counterparty", "counterpartyName", "contraparte",
+    "issuer", "issuerName", "receiver", "receiverName", "emisor", "nombreEmisor",
+    "receptor", "nombreReceptor", "razonSocialEmisor", "razonSocialReceptor",
+    "taxpayerName", "employer", "employerName", "shareholder", "shareholderName",
+    "legalRepresentative", "representanteLegal",
+))
+# Listas de catálogo cuyos elementos llevan "name" como etiqueta, no como nombre de alguien
+_CATALOG_PARENTS = frozenset(key.lower() for key in (
+    "economicActivities", "taxRegimes",
+))
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_ALPHANUMERIC = _LETTERS + "0123456789"
+# Fechas de los seudónimos de RFC: entre 1940-01-01 y 2009-12-31
+_RFC_DATE_BASE = date(1940, 1, 1)
+_RFC_DATE_DAYS = (date(2010, 1, 1) - _RFC_DATE_BASE).days
+# Valor de cada carácter para el dígito verificador del RFC (los de 12 caracteres
+# se completan con un espacio al inicio)
+_RFC_CHECK_VALUES = {char: value for value, char in enumerate("0123456789ABCDEFGHIJKLMN&OPQRSTUVWXYZ Ñ")}
+
+
+SALT_DIR = os.getenv("SYNTAGE_REDACTION_DIR", ".syntage-redaction")
+_RECORDING_ID_FILE = "recording-id"
+
+
+def recording_salt(directory: str, create: bool) -> Optional[str]:
+    """
+    Sal aleatoria de la grabación en directory, guardada en SALT_DIR/<id>.salt.
+    Con create, la crea (con su id) si la grabación todavía no tiene una.
+    None si no existe y no se pidió crearla.
+    """
+    id_path = os.path.join(directory, _RECORDING_ID_FILE)
+    if os.path.exists(id_path):
+        with open(id_path, "r", encoding="utf-8") as f:
+            recording_id = f.read().strip()
+        salt_path = os.path.join(SALT_DIR, f"{recording_id}.salt")
+        if os.path.exists(salt_path):
+            with open(salt_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        if create:
+            raise RuntimeError(
+                f"La grabación {directory} tiene sal aleatoria y {salt_path} no existe: "
+                "define SYNTAGE_REDACTION_SALT o graba en otro directorio"
+            )
+        return None
+    if not create:
+        return None
+
+    recording_id = secrets.token_hex(8)
+    salt = secrets.token_hex(32)
+    os.makedirs(SALT_DIR, exist_ok=True)
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(SALT_DIR, f"{recording_id}.salt"), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(salt)
+    with open(id_path, "w", encoding="utf-8") as f:
+        f.write(recording_id)
+    return salt
+
+
+def _is_name_key(key: Optional[str], parent: Optional[str]) -> bool:
+    """Si el valor de key (dentro de parent) es un nombre de persona o contraparte"""
+    if key is None or key.lower() not in _NAME_KEYS:
+        return False
+    return not (key.lower() == "name" and parent is not None and parent.lower() in _CATALOG_PARENTS)
+
+
+def _digest(value: str, salt: str) -> bytes:
+    return hmac.new(salt.encode("utf-8"), value.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _rfc_check_digit(rfc: str) -> str:
+    """Dígito verificador (módulo 11) de los primeros 11 o 12 caracteres de un RFC"""
+    total = sum(_RFC_CHECK_VALUES[char] * (13 - position)
+                for position, char in enumerate(rfc.rjust(12)))
+    digit = -total % 11
+    return "A" if digit == 10 else str(digit)
+
+
+class Redactor:
+    """Seudónimos deterministas para RFCs y nombres (HMAC con sal; ver recording_salt)"""
+
+    def __init__(self, salt: str):
+        if not salt:
+            raise ValueError("Redactor necesita una sal: sin ella los seudónimos se pueden revertir")
+        self.salt = salt
+
+    def rfc(self, match: "re.Match") -> str:
+        letters, digits, homoclave = match.groups()
+        digest = _digest(match.group(0), self.salt)
+        fecha = _RFC_DATE_BASE + timedelta(days=int.from_bytes(digest[4:8], "big") % _RFC_DATE_DAYS)
+        rfc = (
+            "".join(_LETTERS[byte % 26] for byte in digest[:len(letters)])
+            + fecha.strftime("%y%m%d")
+            + "".join(_ALPHANUMERIC[byte % 36] for byte in digest[10:12])
+        )
+        return rfc + _rfc_check_digit(rfc)
+
+    def text(self, value: str) -> str:
+        return _RFC_PATTERN.sub(self.rfc, value)
+
+    def name(self, value: str) -> str:
+        return f"NOMBRE {_digest(value, self.salt).hex()[:8].upper()}"
+
+    def value(self, value: Any, key: Optional[str] = None, parent: Optional[str] = None) -> Any:
+        """
+        Copia de un documento JSON con RFCs y nombres redactados. parent es la
+        llave que contiene al objeto (o a la lista del objeto) de key.
+        """
+        if isinstance(value, dict):
+            owner = key if key is not None else parent
+            return {k: self.value(v, k, owner) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(item, None, key) for item in value]
+        if isinstance(value, str):
+            if _is_name_key(key, parent) and value:
+                return self.name(value)
+            return self.text(value)
+        return value
+
+    def body(self, content: bytes) -> bytes:
+        """Cuerpo redactado: como JSON si se puede, si no solo los RFCs del texto"""
+        try:
+            document = json.loads(content)
+        except ValueError:
+            return self.text(content.decode("utf-8", "replace")).encode("utf-8")
+        return json.dumps(self.value(document), ensure_ascii=False).encode("utf-8")
+
+
+def sensitive_values(value: Any, key: Optional[str] = None, found: Optional[Set[str]] = None,
+                     parent: Optional[str] = None) -> Set[str]:
+    """Nombres (los que redacta Redactor.value) y RFCs en claro de un documento JSON"""
+    if found is None:
+        found = set()
+    if isinstance(value, dict):
+        owner = key if key is not None else parent
+        for k, v in value.items():
+            sensitive_values(v, k, found, owner)
+    elif isinstance(value, list):
+        for item in value:
+            sensitive_values(item, None, found, key)
+    elif isinstance(value, str):
+        if _is_name_key(key, parent) and len(value.strip()) >= 4:
+            found.add(value)
+        found.update(match.group(0) for match in _RFC_PATTERN.finditer(value))
+    return found
+
+
+def find_leaks(directory: str, values: Set[str]) -> List[Tuple[str, str]]:
+    """(archivo, valor) por cada valor en claro que aparece en index.jsonl o en un blob"""
+    files = [os.path.join(directory, "index.jsonl")]
+    for root, _, names in os.walk(os.path.join(directory, "blobs")):
+        files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".gz"))
+
+    leaks = []
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            text = f.read().decode("utf-8", "replace")
+        leaks.extend((path, value) for value in sorted(values) if value in text)
+    return leaks
+
+
+def request_key(method: str, url: str, redactor: Redactor) -> str:
+    """Llave de una petición: método y ruta con query, redactados"""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    return f"{method} {redactor.text(path)}"
+
+
+class UpstreamRecorder:
+    def __init__(self, directory: str, redactor: Redactor):
+        self.directory = directory
+        self.redactor = redactor
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+
+    def _store_blob(self, content: bytes) -> str:
+        sha = hashlib.sha256(content).hexdigest()
+        path = os.path.join(self.directory, "blobs", sha[:2], f"{sha}.gz")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return sha
+
+    def record(self, method: str, url: str, response: httpx.Response, elapsed: float):
+        """Guarda una respuesta de upstream (bloqueante: llamar fuera del event loop)"""
+        content = response.content
+        line = {
+            "key": request_key(method, url, self.redactor),
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type"),
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "bytes": len(content),
+            "blob": self._store_blob(self.redactor.body(content)),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with self.lock:
+            with open(os.path.join(self.directory, "index.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+class UpstreamReplayer:
+    def __init__(self, directory: str, redactor: Redactor, latency_scale: float = 1.0):
+        self.directory = directory
+        self.redactor = redactor
+        self.latency_scale = latency_scale
+        self.entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.positions: Dict[str, int] = defaultdict(int)
+        with open(os.path.join(directory, "index.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["key"]].append(entry)
+        # Cache de blobs por instancia: no retiene al replayer ni se comparte entre grabaciones
+        self._blob = lru_cache(maxsize=256)(self._read_blob)
+
+    def _read_blob(self, sha: str) -> bytes:
+        with gzip.open(os.path.join(self.directory, "blobs", sha[:2], f"{sha}.gz"), "rb") as f:
+            return f.read()
+
+    def next_entry(self, method: str, url: str) -> Optional[Dict[str, Any]]:
+        """Siguiente respuesta grabada para la petición (en ciclo) o None"""
+        entries = self.entries.get(request_key(method, url, self.redactor))
+        if not entries:
+            return None
+        key = entries[0]["key"]
+        entry = entries[self.positions[key] % len(entries)]
+        self.positions[key] += 1
+        return entry
+
+    async def get(self, url: str) -> Optional[httpx.Response]:
+        """Respuesta grabada tras esperar su latencia original; None si no hay grabación"""
+        entry = self.next_entry("GET", url)
+        if entry is None:
+            return None
+        await asyncio.sleep(entry["elapsed_ms"] / 1000 * self.latency_scale)
+        headers = {"content-type": entry["content_type"]} if entry.get("content_type") else {}
+        return httpx.Response(entry["status"], headers=headers, content=self._blob(entry["blob"]),
+                              request=httpx.Request("GET", url))
+
+
+def _from_env():
+    salt = os.getenv("SYNTAGE_REDACTION_SALT", "")
+    record_dir = os.getenv("SYNTAGE_RECORD_DIR")
+    replay_dir = os.getenv("SYNTAGE_REPLAY_DIR")
+    if record_dir and replay_dir:
+        raise RuntimeError("SYNTAGE_RECORD_DIR y SYNTAGE_REPLAY_DIR no pueden usarse a la vez")
+
+    recorder = replayer = None
+    if record_dir:
+        recorder = UpstreamRecorder(record_dir, Redactor(salt or recording_salt(record_dir, create=True)))
+    if replay_dir:
+        replay_salt = salt or recording_salt(replay_dir, create=False)
+        if not replay_salt:
+            print(f"⚠️ Sin la sal de {replay_dir} (SYNTAGE_REDACTION_SALT o {SALT_DIR}/): "
+                  "las rutas con RFC no coincidirán con la grabación")
+            replay_salt = secrets.token_hex(32)
+        replayer = UpstreamReplayer(
+            replay_dir, Redactor(replay_salt), float(os.getenv("SYNTAGE_REPLAY_LATENCY_SCALE", "1"))
+        )
+    return recorder, replayer
+
+
+# Instancias globales según el entorno (None si el modo no está activo)
+recorder, replayer = _from_env()
+if recorder is not None:
+    print(f"⚠️ SYNTAGE_RECORD_DIR activo: las respuestas de Syntage se graban (redactadas) en {recorder.directory}")
+if replayer is not None:
+    print(f"⚠️ SYNTAGE_REPLAY_DIR activo: se responde desde {replayer.directory} "
+          f"({sum(map(len, replayer.entries.values()))} respuestas grabadas), sin consultar Syntage.")
+
+
+async def upstream_get(client: httpx.AsyncClient, url: str, headers: Dict[str, str]) -> httpx.Response:
+    """
+    client.get(url) con grabación o reproducción según el entorno.
+    En reproducción, una petición sin grabación da una respuesta 404.
+    """
+    if replayer is not None:
+        response = await replayer.get(url)
+        if response is None:
+            return httpx.Response(404, json={"message": f"Not recorded: {request_key('GET', url, replayer.redactor)}"},
+                                  request=httpx.Request("GET", url))
+        return response
+
+    start = time.perf_counter()
+    response = await client.get(url, headers=headers)
+    if recorder is not None:
+        elapsed = time.perf_counter() - start
+        await response.aread()
+        await asyncio.to_thread(recorder.record, "GET", url, response, elapsed)
+    return response
+
+
+def _self_test() -> List[str]:
+    """Errores de dos grabaciones sin SYNTAGE_REDACTION_SALT de la misma respuesta"""
+    import tempfile
+    global SALT_DIR
+
+    document = {"rfc": "SSD1912102V8", "customer": "Laura Mendoza Arreola",
+                "notes": "Proveedor &AB010203XY9, cliente GODE561231GR8"}
+    response = httpx.Response(200, json=document, request=httpx.Request("GET", "https://x/a"))
+    errors = []
+    saved_dir = SALT_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        SALT_DIR = os.path.join(directory, "salts")
+        try:
+            bodies = []
+            for name in ("a", "b"):
+                path = os.path.join(directory, name)
+                recorder = UpstreamRecorder(path, Redactor(recording_salt(path, create=True)))
+                recorder.record("GET", "https://x/insights/SSD1912102V8/risks", response, 0.01)
+                # Grabar otra vez en la misma grabación reutiliza su sal
+                if recording_salt(path, create=True) != recorder.redactor.salt:
+                    errors.append(f"{name}: la sal cambió al volver a abrir la grabación")
+                with open(os.path.join(path, "index.jsonl"), "r", encoding="utf-8") as f:
+                    entry = json.loads(f.readline())
+                if "SSD1912102V8" in entry["key"]:
+                    errors.append(f"{name}: RFC en claro en la ruta {entry['key']}")
+                with gzip.open(os.path.join(path, "blobs", entry["blob"][:2], f"{entry['blob']}.gz"), "rb") as f:
+                    bodies.append(json.loads(f.read()))
+                errors.extend(f"{name}: {value!r} en claro" for _, value in
+                              find_leaks(path, sensitive_values(document)))
+                if find_leaks(path, {recorder.redactor.salt}):
+                    errors.append(f"{name}: la sal quedó dentro de la grabación")
+            first, second = bodies
+            for key in ("rfc", "customer", "notes"):
+                if first[key] == second[key]:
+                    errors.append(f"{key}: el mismo seudónimo en dos grabaciones sin sal configurada")
+            for body in bodies:
+                match = _RFC_PATTERN.fullmatch(body["rfc"])
+                if match is None or _rfc_check_digit(body["rfc"][:-1]) != body["rfc"][-1]:
+                    errors.append(f"seudónimo mal formado: {body['rfc']}")
+                else:
+                    datetime.strptime(match.group(2), "%y%m%d")
+            errors.extend(_replay_errors(os.path.join(directory, "replay")))
+        finally:
+            SALT_DIR = saved_dir
+    return errors
+
+
+def _replay_errors(directory: str) -> List[str]:
+    """Errores al grabar y reproducir un summary: las actividades conservan su nombre"""
+    summary = {
+        "rfc": "SSD1912102V8", "name": "SERVICIOS SANTA DELIA SA DE CV",
+        "economicActivities": [{"name": "Comercio al por mayor de ropa", "percentage": 100}],
+        "taxRegimes": [{"code": 601, "name": "General de Ley Personas Morales"}],
+    }
+    url = "https://x/insights/SSD1912102V8/summary"
+    redactor = Redactor(secrets.token_hex(32))
+    UpstreamRecorder(directory, redactor).record(
+        "GET", url, httpx.Response(200, json=summary, request=httpx.Request("GET", url)), 0.0
+    )
+    response = asyncio.run(UpstreamReplayer(directory, redactor, latency_scale=0).get(url))
+    if response is None:
+        return ["replay: no se encontró la respuesta grabada"]
+    replayed = response.json()
+    errors = []
+    if replayed["name"] == summary["name"]:
+        errors.append("replay: el nombre de la empresa quedó en claro")
+    for key in ("economicActivities", "taxRegimes"):
+        if replayed[key][0]["name"] != summary[key][0]["name"]:
+            errors.append(f"replay: se redactó {key}[].name: {replayed[key][0]['name']!r}")
+    if summary["economicActivities"][0]["name"] in sensitive_values(summary):
+        errors.append("check: economicActivities[].name se reporta como nombre en claro")
+    return errors
+
+
+def main():
+    import argparse
+    from .syntageStandIn import load_fixtures
+
+    parser = argparse.ArgumentParser(description="Revisa la redacción de las grabaciones")
+    parser.add_argument("command", choices=["check", "selftest"],
+                        help="check: busca nombres y RFCs en claro en una grabación; "
+                             "selftest: verifica la redacción con dos grabaciones temporales")
+    parser.add_argument("directory", nargs="?", help="directorio de la grabación (SYNTAGE_RECORD_DIR)")
+    args = parser.parse_args()
+
+    if args.command == "selftest":
+        errors = _self_test()
+        for error in errors:
+            print(f"❌ {error}")
+        if errors:
+            raise SystemExit(1)
+        print("✅ Dos grabaciones sin SYNTAGE_REDACTION_SALT dan seudónimos distintos y bien formados; "
+              "las actividades conservan su nombre al reproducir")
+        return
+    if not args.directory:
+        parser.error("check necesita el directorio de la grabación")
+
+    values: Set[str] = set()
+    for document in load_fixtures().values():
+        sensitive_values(document, found=values)
+    leaks = find_leaks(args.directory, values)
+    for path, value in leaks:
+        print(f"❌ {os.path.relpath(path, args.directory)}: {value!r} en claro")
+    if leaks:
+        raise SystemExit(1)
+    print(f"✅ {args.directory}: ninguno de {len(values)} nombres y RFCs del sustituto aparece en claro")
+
+
+if __name__ == "__main__":
+    main()